@@ -1,78 +1,354 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import re
+import threading
 import numpy as np
-import nltk
-from nltk.tokenize import sent_tokenize
+from vector_index import section_key
+from embedding_backend import load_model
+from lexical_index import BM25Index
+from profiling import NULL_PROFILER
 
-nltk.download('punkt', quiet=True)
+# sentence_transformers (and torch, via embedding_backend) and nltk are imported on first use rather than here:
+# they take seconds to load, and parsing or argument errors shouldn't wait for them
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+_sentence_tokenizer = None
+
+def sent_tokenize(text):
+    global _sentence_tokenizer
+    if _sentence_tokenizer is None:
+        _sentence_tokenizer = _load_sentence_tokenizer()
+    return _sentence_tokenizer(text)
+
+def _load_sentence_tokenizer():
+    # Punkt is resolved from local nltk_data only (the Docker image bundles it); never download at runtime
+    try:
+        from nltk.data import find
+        from nltk.tokenize import PunktTokenizer
+        find('tokenizers/punkt_tab/english/')
+        return PunktTokenizer('english').tokenize
+    except (ImportError, LookupError):
+        print("NLTK punkt data not found locally; falling back to a regex sentence splitter.")
+        return _regex_sent_tokenize
+
+def _regex_sent_tokenize(text):
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(\[])', text.strip()) if sentence]
 
 class PersonaDrivenAnalyzer:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-
-    def analyze_document_collection(self, task_context, all_sections):
-        task_embedding = self.model.encode([task_context])[0]
-        persona_keywords = set([w.lower() for w in task_context.split() if len(w) > 3])
-        doc_coverage = set()
-        scored_sections = []
-        for section in all_sections:
-            heading_quality = 1.0 if section.get('section_title') and len(section['section_title'].split()) > 2 else 0.5
-            doc_bonus = 0.2 if section['document'] not in doc_coverage else 0.0
-            relevance_score = self._calculate_enhanced_relevance(task_embedding, section)
-            final_score = relevance_score * 0.7 + heading_quality * 0.2 + doc_bonus * 0.1
-            section['relevance_score'] = final_score
-            scored_sections.append(section)
+    def __init__(self, batch_size=64, embedding_cache=None, section_index=None, candidate_count=200, profiler=NULL_PROFILER,
+                 backend='torch', threads=None, interop_threads=None, lexical_candidates=None):
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.batch_size = batch_size
+        self.embedding_cache = embedding_cache
+        self.section_index = section_index
+        self.candidate_count = candidate_count
+        self.profiler = profiler
+        self.backend = backend
+        self.threads = threads
+        self.interop_threads = interop_threads
+        self.lexical_candidates = lexical_candidates
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    with self.profiler.stage("analyze.model_load"):
+                        self._model = load_model(MODEL_NAME, self.backend, self.threads, self.interop_threads)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    def warm_up(self):
+        """Start loading the model on a background thread so it overlaps with parsing."""
+        thread = threading.Thread(target=self._warm_up, daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up(self):
+        try:
+            self.model
+        except Exception:
+            # Surfaced again, with its traceback, when the model is first used
+            pass
+
+    def embed_task(self, task_context):
+        with self.profiler.stage("analyze.task_embedding"):
+            task_embedding = self.model.encode([task_context])[0]
+            self._record_encode([task_context])
+        return task_embedding
+
+    def analyze_document_collection(self, task_context, all_sections, section_embeddings=None, semantic_scores=None, task_embedding=None):
+        if task_embedding is None:
+            task_embedding = self.embed_task(task_context)
+        persona_keywords = self._persona_keywords(task_context)
+        # Score every section with one batched encode and one vectorized similarity,
+        # unless the caller already embedded them (e.g. while parsing was still running)
+        # or scored them (e.g. from a previous run's collection state)
+        if semantic_scores is None and self.lexical_candidates and len(all_sections) > self.lexical_candidates:
+            with self.profiler.stage("analyze.lexical_prefilter"):
+                all_sections, section_embeddings = self._lexical_prefilter(task_context, all_sections, section_embeddings)
+        if semantic_scores is None and section_embeddings is None and self.section_index is None:
+            section_embeddings = self._embed_sections(all_sections)
+        if semantic_scores is None and self.section_index is not None:
+            with self.profiler.stage("analyze.candidate_retrieval"):
+                all_sections, section_embeddings = self._retrieve_candidates(task_embedding, all_sections, section_embeddings)
+        with self.profiler.stage("analyze.section_scoring"):
+            if semantic_scores is None:
+                semantic_scores = self._semantic_scores(task_embedding, section_embeddings)
+            final_scores = self._calculate_enhanced_relevance(semantic_scores, all_sections)
+            for section, final_score in zip(all_sections, final_scores):
+                section['relevance_score'] = final_score
         # Prefer sections from diverse documents in top ranks
-        ranked_sections = sorted(scored_sections, key=lambda x: x['relevance_score'], reverse=True)
-        top_sections = []
+        with self.profiler.stage("analyze.diversity_selection"):
+            top_sections = [all_sections[i] for i in self._diverse_top_indices(all_sections, final_scores)]
+        # Subsection analysis: prefer contextually relevant sentences
+        with self.profiler.stage("analyze.key_sentences"):
+            refined_texts = self._extract_key_sentences(task_embedding, [section['content'] for section in top_sections[:15]], persona_keywords)
+        return top_sections, self._subsection_analyses(top_sections, refined_texts)
+
+    def analyze_personas(self, task_contexts, all_sections, section_embeddings=None):
+        """Rank one corpus for several persona/job contexts at once.
+
+        Task contexts are embedded as one matrix and every section is scored against
+        every context with a single matrix product; selection and sentence refinement
+        then run per context, sharing the sentence embeddings of sections picked by
+        more than one. Returns a (top_sections, subsection_analyses) pair per context.
+        """
+        with self.profiler.stage("analyze.task_embedding"):
+            task_embeddings = np.asarray(self.model.encode(list(task_contexts)))
+            self._record_encode(list(task_contexts))
+        if section_embeddings is None:
+            section_embeddings = self._embed_sections(all_sections)
+        rankings = []
+        with self.profiler.stage("analyze.section_scoring"):
+            semantic_scores = self._semantic_score_matrix(task_embeddings, section_embeddings)
+            final_score_matrix = self._calculate_enhanced_relevance(semantic_scores, all_sections)
+        with self.profiler.stage("analyze.diversity_selection"):
+            for column in range(len(task_contexts)):
+                final_scores = final_score_matrix[:, column]
+                # Sections are shared between personas, so each ranking gets its own copies
+                rankings.append([dict(all_sections[i], relevance_score=final_scores[i])
+                                 for i in self._diverse_top_indices(all_sections, final_scores)])
+        with self.profiler.stage("analyze.key_sentences"):
+            refined = self._extract_key_sentences_for(
+                task_embeddings,
+                [[section['content'] for section in top_sections[:15]] for top_sections in rankings],
+                [self._persona_keywords(task_context) for task_context in task_contexts])
+        return [(top_sections, self._subsection_analyses(top_sections, refined_texts))
+                for top_sections, refined_texts in zip(rankings, refined)]
+
+    def _persona_keywords(self, task_context):
+        return set([w.lower() for w in task_context.split() if len(w) > 3])
+
+    def _diverse_top_indices(self, sections, final_scores):
+        # Up to 20 sections by score; past the first 10, only documents not yet represented
+        order = np.argsort(-np.asarray(final_scores), kind='stable')
+        top = []
         seen_docs = set()
-        for sec in ranked_sections:
-            if len(top_sections) >= 20:
+        for i in order:
+            if len(top) >= 20:
                 break
-            if sec['document'] not in seen_docs or len(top_sections) < 10:
-                top_sections.append(sec)
-                seen_docs.add(sec['document'])
-        # Subsection analysis: prefer contextually relevant sentences
-        subsection_analyses = []
-        for section in top_sections[:15]:
-            refined_text = self._extract_key_sentences(task_embedding, section['content'], persona_keywords)
-            subsection_analyses.append({
-                "document": section['document'],
-                "refined_text": refined_text,
-                "page_number": section['page_number']
-            })
-        return top_sections, subsection_analyses
-
-    def _calculate_enhanced_relevance(self, task_embedding, section):
-        content_embedding = self.model.encode([section['content']])[0]
-        semantic_score = cosine_similarity([task_embedding], [content_embedding])[0][0]
-        confidence_weight = section.get('confidence_score', 0.5)
-        length_score = min(len(section['content']) / 1000, 1.0)
-        final_score = (
-            semantic_score * 0.7 +
-            confidence_weight * 0.2 +
-            length_score * 0.1
-        )
-        return final_score
-
-    def _extract_key_sentences(self, task_embedding, section_content, persona_keywords=None):
-        sentences = sent_tokenize(section_content)
-        if len(sentences) <= 3:
-            return section_content
-        sentence_embeddings = self.model.encode(sentences)
-        sentence_scores = []
-        for i, sent_emb in enumerate(sentence_embeddings):
-            similarity = cosine_similarity([task_embedding], [sent_emb])[0][0]
-            position_boost = 0.1 if i == 0 or i == len(sentences)-1 else 0
-            keyword_bonus = 0.15 if persona_keywords and any(kw in sentences[i].lower() for kw in persona_keywords) else 0
-            score = similarity + position_boost + keyword_bonus
-            sentence_scores.append((i, score, sentences[i]))
-        if len(sentences) > 10:
-            top_k = 5
-        elif len(sentences) > 5:
-            top_k = 3
-        else:
-            top_k = 2
-        selected = sorted(sentence_scores, key=lambda x: x[1], reverse=True)[:top_k]
-        selected = sorted(selected, key=lambda x: x[0])
-        return ' '.join([sent[2] for sent in selected])
+            if sections[i]['document'] not in seen_docs or len(top) < 10:
+                top.append(i)
+                seen_docs.add(sections[i]['document'])
+        return top
+
+    def _subsection_analyses(self, top_sections, refined_texts):
+        return [{
+            "document": section['document'],
+            "refined_text": refined_text,
+            "page_number": section['page_number']
+        } for section, refined_text in zip(top_sections[:15], refined_texts)]
+
+    def _lexical_prefilter(self, task_context, sections, section_embeddings=None):
+        # Only the lexical_candidates sections scoring highest under BM25 against the task reach the model
+        index = BM25Index([f"{section.get('section_title', '')} {section['content']}" for section in sections])
+        selected = index.search(task_context, self.lexical_candidates)
+        if section_embeddings is not None:
+            section_embeddings = section_embeddings[selected]
+        return [sections[i] for i in selected], section_embeddings
+
+    def _retrieve_candidates(self, task_embedding, sections, section_embeddings=None):
+        # Index any unseen sections, then re-rank only the nearest candidate_count of them
+        keys = [section_key(section['content']) for section in sections]
+        unseen = {}
+        for i, (key, section) in enumerate(zip(keys, sections)):
+            if key not in self.section_index and key not in unseen:
+                unseen[key] = i
+        if unseen:
+            if section_embeddings is not None:
+                unseen_embeddings = section_embeddings[list(unseen.values())]
+            else:
+                unseen_embeddings = self._encode_sections([sections[i]['content'] for i in unseen.values()])
+            self.section_index.add(list(unseen), unseen_embeddings)
+        if len(sections) > self.candidate_count:
+            hits = set(key for key, _ in self.section_index.search(task_embedding, self.candidate_count, allowed_keys=set(keys)))
+            selected = [i for i, key in enumerate(keys) if key in hits]
+            sections = [sections[i] for i in selected]
+            keys = [keys[i] for i in selected]
+        if not sections:
+            return sections, np.zeros((0, 0), dtype=np.float32)
+        return sections, self.section_index.get(keys)
+
+    def _embed_sections(self, sections):
+        return self._encode_sections([section['content'] for section in sections])
+
+    def _encode_sections(self, texts):
+        # Timed and counted on their own so section throughput excludes sentence and task encodes
+        with self.profiler.stage("embed.sections"):
+            embeddings = self._encode(texts)
+        self.profiler.record_section_encode(len(texts))
+        return embeddings
+
+    def _encode(self, texts):
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self.embedding_cache is None:
+            return self._encode_batched(texts)
+        with self.profiler.stage("embed.cache_lookup"):
+            cached, missing = self.embedding_cache.lookup(texts)
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            fresh = self._encode_batched(missing_texts)
+            self.embedding_cache.store(missing_texts, fresh)
+            # Round fresh vectors through the cache's storage dtype so cold and warm runs score identically
+            fresh = fresh.astype(self.embedding_cache.dtype).astype(np.float32)
+            for i, embedding in zip(missing, fresh):
+                cached[i] = embedding
+        return np.stack(cached)
+
+    def _encode_batched(self, texts):
+        # Encode longest first so each batch pads to similar lengths, then restore input order
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        with self.profiler.stage("embed.encode"):
+            sorted_embeddings = self.model.encode([texts[i] for i in order], batch_size=self.batch_size)
+        self._record_encode(texts)
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return embeddings
+
+    def _record_encode(self, texts):
+        # Tokenizing again costs real time, so it only happens while profiling
+        if not self.profiler.enabled:
+            return
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            tokens = 0
+            if tokenizer is not None:
+                tokens = sum(len(ids) for ids in tokenizer(batch, truncation=True, max_length=getattr(self.model, 'max_seq_length', None))['input_ids'])
+            self.profiler.record_encode(len(batch), tokens)
+
+    def _semantic_scores(self, task_embedding, section_embeddings):
+        # Cosine similarity of each row against the task; zero vectors score 0, as with sklearn
+        if len(section_embeddings) == 0:
+            return np.zeros(0, dtype=np.float32)
+        section_embeddings = np.asarray(section_embeddings)
+        task_norm = np.linalg.norm(task_embedding)
+        row_norms = np.linalg.norm(section_embeddings, axis=1)
+        task_norm = task_norm if task_norm > 0 else 1.0
+        row_norms[row_norms == 0] = 1.0
+        return (section_embeddings @ task_embedding) / (row_norms * task_norm)
+
+    def _semantic_score_matrix(self, task_embeddings, section_embeddings):
+        # Cosine similarity of every section (rows) against every task (columns) in one product
+        if len(section_embeddings) == 0:
+            return np.zeros((0, len(task_embeddings)), dtype=np.float32)
+        section_embeddings = np.asarray(section_embeddings)
+        task_norms = np.linalg.norm(task_embeddings, axis=1)
+        row_norms = np.linalg.norm(section_embeddings, axis=1)
+        task_norms[task_norms == 0] = 1.0
+        row_norms[row_norms == 0] = 1.0
+        return (section_embeddings @ task_embeddings.T) / np.outer(row_norms, task_norms)
+
+    def _calculate_enhanced_relevance(self, semantic_scores, sections):
+        # Final ranking score per section, or per section and persona for a score matrix.
+        # Section terms are computed in Python floats and rounded to the scores' dtype,
+        # matching what scoring one section at a time produced
+        semantic_scores = np.asarray(semantic_scores)
+        dtype = semantic_scores.dtype
+        per_row = (slice(None),) + (None,) * (semantic_scores.ndim - 1)
+        confidence_term = np.array([section.get('confidence_score', 0.5) * 0.2 for section in sections], dtype=np.float64).astype(dtype)
+        length_term = np.array([min(len(section['content']) / 1000, 1.0) * 0.1 for section in sections], dtype=np.float64).astype(dtype)
+        relevance = semantic_scores * 0.7 + confidence_term[per_row] + length_term[per_row]
+        heading_term = np.array([(1.0 if section.get('section_title') and len(section['section_title'].split()) > 2 else 0.5) * 0.2
+                                 for section in sections], dtype=np.float64).astype(dtype)
+        # Every section gets the first-document bonus of 0.2
+        doc_bonus = 0.2
+        return relevance * 0.7 + heading_term[per_row] + doc_bonus * 0.1
+
+    def _extract_key_sentences(self, task_embedding, section_contents, persona_keywords=None):
+        return self._extract_key_sentences_for(np.asarray([task_embedding]), [section_contents], [persona_keywords])[0]
+
+    def _extract_key_sentences_for(self, task_embeddings, contents_per_task, keywords_per_task):
+        # Sentences of each distinct section are tokenized and encoded once, together,
+        # then scored per task against only that task's sections
+        with self.profiler.stage("analyze.sentence_tokenize"):
+            tokenized = {content: None for contents in contents_per_task for content in contents}
+            for content in tokenized:
+                tokenized[content] = sent_tokenize(content)
+        sentences = []
+        spans = {}
+        for content, section_sentences in tokenized.items():
+            if len(section_sentences) > 3:
+                spans[content] = (len(sentences), len(sentences) + len(section_sentences))
+                sentences.extend(section_sentences)
+        sentence_embeddings = self._encode(sentences) if sentences else None
+        return [self._refine_sections(task_embedding, contents, persona_keywords, sentences, spans, sentence_embeddings)
+                for task_embedding, contents, persona_keywords in zip(task_embeddings, contents_per_task, keywords_per_task)]
+
+    def _refine_sections(self, task_embedding, section_contents, persona_keywords, all_sentences, all_spans, all_embeddings):
+        rows = []
+        spans = []
+        for content in section_contents:
+            span = all_spans.get(content)
+            if span is None:
+                spans.append(None)
+                continue
+            spans.append((len(rows), len(rows) + span[1] - span[0]))
+            rows.extend(range(*span))
+        sentences = [all_sentences[i] for i in rows]
+        if sentences:
+            scores = self._semantic_scores(task_embedding, all_embeddings[rows]).astype(np.float32)
+            position_boost = np.zeros(len(sentences), dtype=np.float32)
+            for start, end in filter(None, spans):
+                position_boost[start] = position_boost[end - 1] = 0.1
+            scores = scores + position_boost
+            keyword_matcher = self._keyword_matcher(persona_keywords)
+            if keyword_matcher is not None:
+                has_keyword = np.fromiter((keyword_matcher.search(sentence.lower()) is not None for sentence in sentences), dtype=bool, count=len(sentences))
+                scores = scores + np.where(has_keyword, np.float32(0.15), np.float32(0))
+        refined_texts = []
+        for content, span in zip(section_contents, spans):
+            if span is None:
+                refined_texts.append(content)
+                continue
+            start, end = span
+            count = end - start
+            if count > 10:
+                top_k = 5
+            elif count > 5:
+                top_k = 3
+            else:
+                top_k = 2
+            selected = self._top_k_indices(scores[start:end], top_k)
+            refined_texts.append(' '.join(sentences[start + i] for i in selected))
+        return refined_texts
+
+    def _keyword_matcher(self, persona_keywords):
+        # One alternation regex replaces a substring scan per keyword per sentence
+        if not persona_keywords:
+            return None
+        return re.compile('|'.join(re.escape(kw) for kw in sorted(persona_keywords, key=len, reverse=True)))
+
+    def _top_k_indices(self, scores, k):
+        # Highest scores in their original order; ties at the cut-off keep the earliest sentences
+        if k >= len(scores):
+            return np.arange(len(scores))
+        threshold = scores[np.argpartition(-scores, k - 1)[:k]].min()
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+        return np.sort(np.concatenate([above, ties]))
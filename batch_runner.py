@@ -0,0 +1,116 @@
+import argparse
+import glob
+import json
+import os
+import time
+from analysis_engine import PersonaDrivenAnalyzer, MODEL_NAME
+from embedding_backend import BACKENDS, model_key
+from embedding_cache import EmbeddingCache, MemoryEmbeddingCache
+from main import load_challenge_input, prepare_job, process_pipeline, generate_output, open_parse_cache, positive_int
+from parse_cache import MemoryParseCache
+
+INPUT_NAME = 'challenge1b_input.json'
+
+def find_inputs(paths, root):
+    # Accept input JSON files or collection directories; with neither, scan root's subdirectories
+    if not paths:
+        return sorted(glob.glob(os.path.join(root, '*', INPUT_NAME)))
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            path = os.path.join(path, INPUT_NAME)
+        if not os.path.exists(path):
+            print(f"Input file not found: {path}")
+            continue
+        inputs.append(path)
+    return inputs
+
+def run_batch(input_paths, output_name, batch_size=64, embedding_cache=None, workers=1, use_parse_cache=True, backend='torch', threads=None, interop_threads=None, embedding_cache_size=200000):
+    # One analyzer and one in-memory parse store serve every collection, so PDFs and
+    # sections shared between collections are parsed and embedded once. Without a
+    # persistent cache, embeddings are kept in memory up to embedding_cache_size
+    if embedding_cache is None:
+        embedding_cache = MemoryEmbeddingCache(max_entries=embedding_cache_size)
+    analyzer = PersonaDrivenAnalyzer(batch_size=batch_size, embedding_cache=embedding_cache,
+                                     backend=backend, threads=threads, interop_threads=interop_threads)
+    parsed_documents = {}
+    summary = []
+    for input_path in input_paths:
+        timings = {}
+        start_time = time.time()
+        try:
+            input_config = load_challenge_input(input_path)
+            task_context, documents, metadata = prepare_job(input_config)
+        except (SystemExit, KeyError) as e:
+            print(f"Skipping {input_path}: invalid input ({e})")
+            summary.append({"input": input_path, "status": "error"})
+            continue
+        timings["load"] = time.time() - start_time
+        backing = open_parse_cache(input_path) if use_parse_cache else None
+        parse_cache = MemoryParseCache(backing=backing, entries=parsed_documents)
+        results = process_pipeline(task_context, documents, input_path, metadata,
+                                   workers=workers, parse_cache=parse_cache, analyzer=analyzer, timings=timings)
+        output_path = os.path.join(os.path.dirname(os.path.abspath(input_path)), output_name)
+        write_start = time.time()
+        generate_output(results, output_path)
+        timings["write"] = time.time() - write_start
+        timings["total"] = time.time() - start_time
+        summary.append({
+            "input": input_path,
+            "output": output_path,
+            "status": "ok",
+            "documents": len(results[2]["documents"]),
+            "timings": {stage: round(seconds, 4) for stage, seconds in timings.items()}
+        })
+    return summary
+
+def print_summary(summary):
+    stages = ["load", "parse", "embed_wait", "analyze", "write", "total"]
+    print(f"{'input':<50}" + ''.join(f"{stage:>12}" for stage in stages))
+    totals = dict.fromkeys(stages, 0.0)
+    for entry in summary:
+        if entry["status"] != "ok":
+            print(f"{entry['input']:<50}{'error':>12}")
+            continue
+        for stage in stages:
+            totals[stage] += entry["timings"].get(stage, 0.0)
+        print(f"{entry['input'][-50:]:<50}" + ''.join(f"{entry['timings'].get(stage, 0.0):>12.2f}" for stage in stages))
+    print(f"{'all collections':<50}" + ''.join(f"{totals[stage]:>12.2f}" for stage in stages))
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the analysis pipeline over many collections in one process.")
+    parser.add_argument('inputs', nargs='*', help='Input JSON files or collection directories (default: every */challenge1b_input.json under --root)')
+    parser.add_argument('--root', type=str, default='.', help='Directory scanned for collections when no inputs are given')
+    parser.add_argument('--output-name', type=str, default='challenge1b_output.json', help='Output file name written next to each input JSON')
+    parser.add_argument('--summary', type=str, default=None, help='Optional path for a JSON summary of per-collection stage timings')
+    parser.add_argument('--batch-size', type=int, default=64, help='Number of sections encoded per model batch')
+    parser.add_argument('--embedding-cache', type=str, default=None, help='Directory for the persistent embedding cache (in-memory only if omitted)')
+    parser.add_argument('--embedding-cache-size', type=positive_int, default=200000, help='Maximum number of embeddings kept in the cache (on disk, or in memory without --embedding-cache)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes used to parse PDFs (0 uses every core)')
+    parser.add_argument('--no-parse-cache', action='store_true', help='Do not read or write the on-disk parse caches')
+    parser.add_argument('--backend', type=str, choices=BACKENDS, default='torch', help='Embedding inference backend: full-precision PyTorch, int8-quantized PyTorch, or ONNX Runtime (fp32 or int8)')
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op threads used by the embedding backend (library default if omitted)')
+    parser.add_argument('--interop-threads', type=int, default=None, help='Inter-op threads used by the embedding backend (library default if omitted)')
+    args = parser.parse_args()
+
+    input_paths = find_inputs(args.inputs, args.root)
+    if not input_paths:
+        print("No input files found.")
+        exit(1)
+    embedding_cache = None
+    if args.embedding_cache:
+        embedding_cache = EmbeddingCache(args.embedding_cache, model_key(MODEL_NAME, args.backend), max_entries=args.embedding_cache_size)
+    start_time = time.time()
+    summary = run_batch(input_paths, args.output_name, batch_size=args.batch_size, embedding_cache=embedding_cache,
+                        workers=args.workers, use_parse_cache=not args.no_parse_cache,
+                        backend=args.backend, threads=args.threads, interop_threads=args.interop_threads,
+                        embedding_cache_size=args.embedding_cache_size)
+    elapsed = time.time() - start_time
+    print_summary(summary)
+    print(f"Processed {len(input_paths)} collection(s) in {elapsed:.2f} seconds.")
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump({"collections": summary, "elapsed": round(elapsed, 4)}, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare embedding backends on the bundled collections: latency, peak RSS and top-20 agreement.
+
+Every backend runs main.py in a fresh process per collection. Its top-20
+extracted sections are compared with the full-precision 'torch' ranking: overlap
+of the top 10 and top 20 and the mean rank shift of sections present in both.
+The run fails if any collection's top-20 overlap falls below --min-overlap.
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from embedding_backend import BACKENDS
+from run_suite import run_pipeline
+
+
+def ranking(output):
+    return [(section["document"], section["page_number"], section["section_title"]) for section in output["extracted_sections"]]
+
+
+def agreement(reference, candidate):
+    overlap_10 = len(set(reference[:10]) & set(candidate[:10])) / max(min(len(reference), 10), 1)
+    overlap_20 = len(set(reference[:20]) & set(candidate[:20])) / max(min(len(reference), 20), 1)
+    positions = {key: rank for rank, key in enumerate(candidate)}
+    shifts = [abs(rank - positions[key]) for rank, key in enumerate(reference) if key in positions]
+    return overlap_10, overlap_20, (sum(shifts) / len(shifts) if shifts else 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends against the full-precision model.")
+    parser.add_argument('--collections', type=str, default=os.path.join(ROOT, 'Collection *', 'challenge1b_input.json'), help='Glob of input JSON files to run')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS), help='Backends to compare (torch is always run as the reference)')
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op threads passed to every backend')
+    parser.add_argument('--interop-threads', type=int, default=None, help='Inter-op threads passed to every backend')
+    parser.add_argument('--min-overlap', type=float, default=0.9, help='Lowest acceptable top-20 overlap with the torch ranking')
+    args = parser.parse_args()
+
+    thread_args = []
+    if args.threads:
+        thread_args += ['--threads', str(args.threads)]
+    if args.interop_threads:
+        thread_args += ['--interop-threads', str(args.interop_threads)]
+    backends = ['torch'] + [backend for backend in args.backends if backend != 'torch']
+    failures = []
+    print(f"{'collection':<14}{'backend':<11}{'latency':>9}{'encode':>9}{'rss MB':>9}{'top10':>7}{'top20':>7}{'shift':>7}")
+    for input_path in sorted(glob.glob(args.collections)):
+        name = os.path.basename(os.path.dirname(os.path.abspath(input_path)))
+        reference = None
+        for backend in backends:
+            with tempfile.TemporaryDirectory() as work_dir:
+                try:
+                    latency, report, output = run_pipeline(input_path, work_dir, ['--backend', backend] + thread_args)
+                except Exception as e:
+                    print(f"{name:<14}{backend:<11} failed: {e}")
+                    failures.append(f"{name} {backend}")
+                    if reference is None:
+                        break
+                    continue
+            encode_wall = report["stages"].get("embed.encode", {}).get("wall", 0.0)
+            if reference is None:
+                reference = ranking(output)
+            overlap_10, overlap_20, shift = agreement(reference, ranking(output))
+            if overlap_20 < args.min_overlap:
+                failures.append(f"{name} {backend}: top-20 overlap {overlap_20:.2f}")
+            print(f"{name:<14}{backend:<11}{latency:>8.2f}s{encode_wall:>8.2f}s{report['peak_rss_mb']['main']:>9.1f}{overlap_10:>7.2f}{overlap_20:>7.2f}{shift:>7.2f}")
+    if failures:
+        print("Failed: " + "; ".join(failures))
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
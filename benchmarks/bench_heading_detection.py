@@ -0,0 +1,122 @@
+"""Compare the per-page feature sweep with the original quadratic heading detection."""
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fitz  # PyMuPDF
+from pdf_parser import EnhancedPDFParser
+
+
+class LegacyHeadingParser(EnhancedPDFParser):
+    """Reference implementation of the heading detection this benchmark replaces."""
+
+    def _split_page_sections(self, blocks, features):
+        sections = []
+        for block in blocks:
+            if self._is_section_heading(block, blocks):
+                sections.append((block, self._extract_section_content(block, blocks)))
+        return sections
+
+    def _is_section_heading(self, block, context_blocks):
+        score = 0
+        if self._has_font_size_jump(block, context_blocks):
+            score += 0.3
+        if self._is_isolated_block(block):
+            score += 0.2
+        if self._is_bold_or_styled(block):
+            score += 0.2
+        if self._is_heading_length(block):
+            score += 0.3
+        return score > 0.6
+
+    def _has_font_size_jump(self, block, context_blocks):
+        try:
+            block_size = block['lines'][0]['spans'][0]['size']
+            sizes = [b['lines'][0]['spans'][0]['size'] for b in context_blocks if b.get('lines')]
+            avg_size = sum(sizes) / len(sizes) if sizes else 0
+            return block_size - avg_size > self.heading_indicators['font_size_jump']
+        except Exception:
+            return False
+
+    def _is_heading_length(self, block):
+        try:
+            text = ''.join([span['text'] for line in block.get('lines', []) for span in line.get('spans', [])])
+            return 2 <= len(text.split()) <= 12
+        except Exception:
+            return False
+
+    def _extract_section_content(self, heading_block, blocks):
+        lines = []
+        found_heading = False
+        heading_text = ''
+        for line in heading_block.get('lines', []):
+            for span in line.get('spans', []):
+                heading_text += span['text'] + ' '
+        heading_text = heading_text.strip()
+        for block in blocks:
+            if found_heading:
+                if self._is_section_heading(block, blocks):
+                    break
+                for line in block.get('lines', []):
+                    for span in line.get('spans', []):
+                        lines.append(span['text'])
+            elif block == heading_block:
+                found_heading = True
+        content = ' '.join(lines).strip()
+        confidence = 0.9 if heading_text else 0.5
+        return {"title": heading_text, "content": content, "confidence": confidence}
+
+
+def load_pages(pdf_paths):
+    pages = []
+    for pdf_path in pdf_paths:
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                pages.append(page.get_text("dict")["blocks"])
+    return pages
+
+
+def time_detection(parser, pages, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for blocks in pages:
+            features = parser._page_block_features(blocks)
+            parser._split_page_sections(blocks, features)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark heading detection on the bundled collections.")
+    parser.add_argument('--pdfs', type=str, default=os.path.join(ROOT, 'Collection *', 'PDFs', '*.pdf'), help='Glob of PDFs to benchmark')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed repetitions per variant (best is reported)')
+    args = parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(args.pdfs))
+    legacy = LegacyHeadingParser()
+    current = EnhancedPDFParser()
+
+    mismatches = [p for p in pdf_paths if legacy.extract_structured_content(p) != current.extract_structured_content(p)]
+    pages = load_pages(pdf_paths)
+    blocks = sum(len(page) for page in pages)
+    legacy_time = time_detection(legacy, pages, args.repeats)
+    current_time = time_detection(current, pages, args.repeats)
+
+    print(f"documents: {len(pdf_paths)}, pages: {len(pages)}, blocks: {blocks}")
+    print(f"legacy heading detection: {legacy_time:.3f}s")
+    print(f"per-page feature sweep: {current_time:.3f}s")
+    print(f"speedup: {legacy_time / current_time:.1f}x")
+    print(f"identical output: {not mismatches}")
+    for pdf_path in mismatches:
+        print(f"  differs: {os.path.relpath(pdf_path, ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
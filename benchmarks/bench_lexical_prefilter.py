@@ -0,0 +1,69 @@
+"""Measure recall of the BM25 pre-filter against full neural scoring on the bundled collections.
+
+For each collection and candidate count N, reports how many sections reach the
+model, how many of the fully scored top 20 survive the pre-filter (candidate
+recall) and how many end up in the pre-filtered top 20 (top-20 recall).
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from analysis_engine import PersonaDrivenAnalyzer
+from embedding_cache import MemoryEmbeddingCache
+from lexical_index import BM25Index
+from main import load_challenge_input, prepare_job, resolve_documents
+from parallel_parser import iter_parse_documents
+
+
+def load_sections(input_path):
+    task_context, documents, _ = prepare_job(load_challenge_input(input_path))
+    sections = []
+    for doc, pdf_path, abs_pdf_path in resolve_documents(documents, input_path):
+        for _, parsed, error in iter_parse_documents([abs_pdf_path]):
+            for section in parsed or []:
+                section["document"] = os.path.basename(pdf_path)
+                sections.append(section)
+    return task_context, sections
+
+
+def top_keys(analyzer, task_context, sections):
+    ranked, _ = analyzer.analyze_document_collection(task_context, [dict(section) for section in sections])
+    return [(section["document"], section["page_number"], section["section_title"]) for section in ranked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the BM25 pre-filter against full scoring.")
+    parser.add_argument('--collections', type=str, default=os.path.join(ROOT, 'Collection *', 'challenge1b_input.json'), help='Glob of input JSON files to run')
+    parser.add_argument('--candidates', type=int, nargs='+', default=[25, 50, 100, 200], help='Pre-filter sizes to evaluate')
+    args = parser.parse_args()
+
+    # Embeddings are shared between runs so only scoring differs; inference volume is counted, not timed
+    embedding_cache = MemoryEmbeddingCache()
+    full = PersonaDrivenAnalyzer(embedding_cache=embedding_cache)
+    print(f"{'collection':<14}{'N':>6}{'embedded':>14}{'bm25 ms':>9}{'cand. recall':>14}{'top-20 recall':>15}")
+    for input_path in sorted(glob.glob(args.collections)):
+        name = os.path.basename(os.path.dirname(os.path.abspath(input_path)))
+        task_context, sections = load_sections(input_path)
+        reference = top_keys(full, task_context, sections)
+        keys = [(section["document"], section["page_number"], section["section_title"]) for section in sections]
+        for candidates in args.candidates:
+            start = time.perf_counter()
+            index = BM25Index([f"{section.get('section_title', '')} {section['content']}" for section in sections])
+            selected = set(keys[i] for i in index.search(task_context, candidates))
+            elapsed = (time.perf_counter() - start) * 1000
+            prefiltered = PersonaDrivenAnalyzer(embedding_cache=embedding_cache, lexical_candidates=candidates)
+            prefiltered.model = full.model
+            result = top_keys(prefiltered, task_context, sections)
+            candidate_recall = sum(key in selected for key in reference) / max(len(reference), 1)
+            top_recall = len(set(reference) & set(result)) / max(len(reference), 1)
+            embedded = f"{min(candidates, len(sections))}/{len(sections)}"
+            print(f"{name:<14}{candidates:>6}{embedded:>14}{elapsed:>9.1f}{candidate_recall:>14.2f}{top_recall:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Show that parser peak memory stays flat as page count grows."""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fitz  # PyMuPDF
+
+
+def build_large_pdf(source_path, pages, output_path):
+    # Replicate a bundled PDF until the target page count is reached
+    with fitz.open(source_path) as source, fitz.open() as target:
+        while len(target) < pages:
+            target.insert_pdf(source, to_page=min(len(source), pages - len(target)) - 1)
+        target.save(output_path)
+
+
+def parse_in_child(pdf_path):
+    # Runs in a fresh interpreter so ru_maxrss reflects this parse alone
+    from pdf_parser import EnhancedPDFParser
+    start = time.perf_counter()
+    sections = EnhancedPDFParser().extract_structured_content(pdf_path)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{elapsed:.3f} {peak_mb:.1f} {len(sections)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parser peak memory against page count.")
+    parser.add_argument('--source', type=str, default=os.path.join(ROOT, 'Collection 1', 'PDFs', 'South of France - Cities.pdf'), help='PDF replicated to build the test documents')
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 1000], help='Page counts to test')
+    parser.add_argument('--child', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        parse_in_child(args.child)
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for pages in args.pages:
+            pdf_path = os.path.join(tmp_dir, f'{pages}.pdf')
+            build_large_pdf(args.source, pages, pdf_path)
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', pdf_path],
+                                    check=True, capture_output=True, text=True, cwd=ROOT)
+            elapsed, peak_mb, sections = result.stdout.split()
+            print(f"pages: {pages:>5}  parse: {float(elapsed):7.2f}s  ({pages / float(elapsed):6.1f} pages/s)  peak RSS: {float(peak_mb):7.1f} MB  sections kept: {sections}")
+
+
+if __name__ == "__main__":
+    main()
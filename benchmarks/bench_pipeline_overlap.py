@@ -0,0 +1,54 @@
+"""Compare phased and overlapped parse -> embed -> rank pipelines on one collection."""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from analysis_engine import PersonaDrivenAnalyzer
+from main import load_challenge_input, prepare_job, process_pipeline, resolve_documents
+from parallel_parser import iter_parse_documents
+
+
+def run(analyzer, input_path, workers, overlap):
+    task_context, documents, metadata = prepare_job(load_challenge_input(input_path))
+    timings = {}
+    start = time.perf_counter()
+    process_pipeline(task_context, documents, input_path, metadata, workers=workers,
+                     analyzer=analyzer, timings=timings, overlap=overlap)
+    return time.perf_counter() - start, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark overlapped parsing and embedding.")
+    parser.add_argument('--input', type=str, default=os.path.join(ROOT, 'Collection 2', 'challenge1b_input.json'), help='Path to input JSON file')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes used to parse PDFs (0 uses every core)')
+    parser.add_argument('--batch-size', type=int, default=64, help='Number of sections encoded per model batch')
+    args = parser.parse_args()
+
+    # Parse caches are deliberately not used: the point is to overlap real parsing with inference
+    analyzer = PersonaDrivenAnalyzer(batch_size=args.batch_size)
+    _, documents, _ = prepare_job(load_challenge_input(args.input))
+    pdf_paths = [abs_pdf_path for _, _, abs_pdf_path in resolve_documents(documents, args.input)]
+
+    start = time.perf_counter()
+    sections = [section for _, parsed, _ in iter_parse_documents(pdf_paths, workers=args.workers) for section in parsed or []]
+    parse_only = time.perf_counter() - start
+    start = time.perf_counter()
+    analyzer._embed_sections(sections)
+    embed_only = time.perf_counter() - start
+
+    phased, phased_timings = run(analyzer, args.input, args.workers, overlap=False)
+    overlapped, overlapped_timings = run(analyzer, args.input, args.workers, overlap=True)
+
+    print(f"sections: {len(sections)}")
+    print(f"parse only: {parse_only:.2f}s, embed only: {embed_only:.2f}s, "
+          f"max: {max(parse_only, embed_only):.2f}s, sum: {parse_only + embed_only:.2f}s")
+    print(f"phased pipeline: {phased:.2f}s {({k: round(v, 2) for k, v in phased_timings.items()})}")
+    print(f"overlapped pipeline: {overlapped:.2f}s {({k: round(v, 2) for k, v in overlapped_timings.items()})}")
+
+
+if __name__ == "__main__":
+    main()
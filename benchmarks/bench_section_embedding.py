@@ -0,0 +1,81 @@
+"""Compare per-section encoding against the batched section scoring path."""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.metrics.pairwise import cosine_similarity
+from pdf_parser import EnhancedPDFParser
+from analysis_engine import PersonaDrivenAnalyzer
+
+
+def load_sections(input_path):
+    with open(input_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(input_path))
+    parser = EnhancedPDFParser()
+    sections = []
+    for doc in config["documents"]:
+        pdf_path = os.path.join(base_dir, 'PDFs', doc["filename"])
+        for section in parser.extract_structured_content(pdf_path):
+            section["document"] = doc["filename"]
+            sections.append(section)
+    task_context = f"As a {config['persona']['role']}, I need to {config['job_to_be_done']['task']}"
+    return task_context, sections
+
+
+def per_section_scores(analyzer, task_embedding, sections):
+    scores = []
+    for section in sections:
+        content_embedding = analyzer.model.encode([section['content']])[0]
+        scores.append(cosine_similarity([task_embedding], [content_embedding])[0][0])
+    return scores
+
+
+def batched_scores(analyzer, task_embedding, sections):
+    return analyzer._semantic_scores(task_embedding, analyzer._embed_sections(sections))
+
+
+def best_of(fn, repeats):
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched section embedding.")
+    parser.add_argument('--input', type=str, default='Collection 1/challenge1b_input.json', help='Path to input JSON file')
+    parser.add_argument('--batch-size', type=int, default=64, help='Number of sections encoded per model batch')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed repetitions per variant (best is reported)')
+    args = parser.parse_args()
+
+    task_context, sections = load_sections(args.input)
+    analyzer = PersonaDrivenAnalyzer(batch_size=args.batch_size)
+    task_embedding = analyzer.model.encode([task_context])[0]
+    # Warm up the model so the first variant does not pay for lazy initialisation
+    analyzer.model.encode([sections[0]['content']])
+
+    per_section_time, reference = best_of(lambda: per_section_scores(analyzer, task_embedding, sections), args.repeats)
+    batched_time, batched = best_of(lambda: batched_scores(analyzer, task_embedding, sections), args.repeats)
+
+    reference_order = sorted(range(len(sections)), key=lambda i: -reference[i])
+    batched_order = sorted(range(len(sections)), key=lambda i: -batched[i])
+    max_diff = max(abs(float(a) - float(b)) for a, b in zip(reference, batched))
+    print(f"sections: {len(sections)}")
+    print(f"per-section: {per_section_time:.3f}s")
+    print(f"batched (batch_size={args.batch_size}): {batched_time:.3f}s")
+    print(f"speedup: {per_section_time / batched_time:.1f}x")
+    print(f"max score difference: {max_diff:.2e}")
+    print(f"identical ranking: {reference_order == batched_order}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure recall and latency of the IVF section index against exhaustive scoring."""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from vector_index import SectionIndex, _normalize
+
+
+def clustered_corpus(n, dim, topics, noise, rng):
+    # Embeddings of real documents cluster by topic, so sample around random topic centres
+    centres = _normalize(rng.standard_normal((topics, dim)))
+    labels = rng.integers(0, topics, n)
+    return _normalize(centres[labels] + noise * rng.standard_normal((n, dim)) / np.sqrt(dim)), centres
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the section index against exhaustive scoring.")
+    parser.add_argument('--sections', type=int, default=100000, help='Number of synthetic section embeddings')
+    parser.add_argument('--dim', type=int, default=384, help='Embedding dimension (all-MiniLM-L6-v2 uses 384)')
+    parser.add_argument('--topics', type=int, default=500, help='Number of synthetic topic clusters')
+    parser.add_argument('--noise', type=float, default=0.8, help='Spread of sections around their topic centre (relative to unit norm)')
+    parser.add_argument('--queries', type=int, default=100, help='Number of queries')
+    parser.add_argument('--candidates', type=int, default=200, help='Candidates retrieved per query')
+    parser.add_argument('--output-size', type=int, default=20, help='Size of the final ranking checked for survival in the candidates')
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[4, 8, 16, 32], help='Lists probed per query')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors, centres = clustered_corpus(args.sections, args.dim, args.topics, args.noise, rng)
+    queries = _normalize(centres[rng.integers(0, args.topics, args.queries)] + args.noise * rng.standard_normal((args.queries, args.dim)) / np.sqrt(args.dim))
+    keys = [str(i) for i in range(args.sections)]
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = SectionIndex(index_dir, 'benchmark')
+        start = time.perf_counter()
+        # Add in increments, the way documents arrive, so incremental retraining is exercised
+        for begin in range(0, args.sections, 10000):
+            index.add(keys[begin:begin + 10000], vectors[begin:begin + 10000])
+        build_time = time.perf_counter() - start
+        index.save()
+        print(f"sections: {args.sections}, lists: {len(index.centroids)}, build: {build_time:.2f}s")
+
+        start = time.perf_counter()
+        exact = []
+        exact_top = []
+        for query in queries:
+            scores = vectors @ query
+            exact.append(set(np.argpartition(-scores, args.candidates - 1)[:args.candidates].tolist()))
+            exact_top.append(set(np.argsort(-scores)[:args.output_size].tolist()))
+        exhaustive_ms = (time.perf_counter() - start) / args.queries * 1000
+        print(f"exhaustive: {exhaustive_ms:.2f} ms/query")
+
+        for n_probe in args.n_probe:
+            index.n_probe = n_probe
+            start = time.perf_counter()
+            results = [index.search(query, args.candidates) for query in queries]
+            ivf_ms = (time.perf_counter() - start) / args.queries * 1000
+            retrieved = [set(int(key) for key, _ in result) for result in results]
+            recall = np.mean([len(truth & found) / args.candidates for truth, found in zip(exact, retrieved)])
+            # The output only keeps the best few sections, so what matters most is whether those survive retrieval
+            top_recall = np.mean([len(truth & found) / args.output_size for truth, found in zip(exact_top, retrieved)])
+            print(f"ivf n_probe={n_probe}: {ivf_ms:.2f} ms/query, recall@{args.candidates}: {recall:.3f}, "
+                  f"top-{args.output_size} kept: {top_recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
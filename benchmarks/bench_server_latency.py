@@ -0,0 +1,88 @@
+"""Compare cold CLI runs with requests served by a warm server process."""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cold_cli(input_path, output_path):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), '--input', input_path, '--output', output_path],
+                   check=True, cwd=ROOT, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def post_analyze(port, input_path):
+    url = f"http://127.0.0.1:{port}/analyze?input_path={urllib.parse.quote(os.path.abspath(input_path))}"
+    start = time.perf_counter()
+    with urllib.request.urlopen(urllib.request.Request(url, data=b'', method='POST')) as response:
+        json.load(response)
+    return time.perf_counter() - start
+
+
+def wait_for_server(port, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health"):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server did not become healthy within {timeout} seconds")
+
+
+def concurrent_latency(port, input_paths):
+    latencies = [None] * len(input_paths)
+
+    def run(i):
+        latencies[i] = post_analyze(port, input_paths[i])
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(input_paths))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server latency against the cold CLI.")
+    parser.add_argument('--inputs', nargs='+', default=[os.path.join(ROOT, f'Collection {i}', 'challenge1b_input.json') for i in (1, 2, 3)], help='Input JSON files to run')
+    parser.add_argument('--port', type=int, default=8765, help='Port for the temporary server')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per input for each mode')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cli_times = [cold_cli(path, os.path.join(tmp_dir, 'out.json')) for path in args.inputs for _ in range(args.repeats)]
+
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'server.py'), '--port', str(args.port)],
+                              cwd=ROOT, stdout=subprocess.DEVNULL)
+    try:
+        start = time.perf_counter()
+        wait_for_server(args.port, timeout=300)
+        startup = time.perf_counter() - start
+        # The first request per input warms the parse cache just like the CLI runs above did
+        for path in args.inputs:
+            post_analyze(args.port, path)
+        warm_times = [post_analyze(args.port, path) for path in args.inputs for _ in range(args.repeats)]
+        concurrent_wall, concurrent_times = concurrent_latency(args.port, args.inputs * args.repeats)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"cold CLI: mean {sum(cli_times) / len(cli_times):.2f}s, min {min(cli_times):.2f}s over {len(cli_times)} runs")
+    print(f"server startup (one-off): {startup:.2f}s")
+    print(f"warm server, sequential: mean {sum(warm_times) / len(warm_times):.2f}s, min {min(warm_times):.2f}s")
+    print(f"warm server, {len(concurrent_times)} concurrent: wall {concurrent_wall:.2f}s, mean latency {sum(concurrent_times) / len(concurrent_times):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
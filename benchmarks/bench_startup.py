@@ -0,0 +1,51 @@
+"""Measure cold-start time from process launch to the first parsed page."""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(pdf_path, eager):
+    sys.path.insert(0, ROOT)
+    if eager:
+        # What importing analysis_engine used to cost before the heavy modules became lazy
+        import sentence_transformers  # noqa: F401
+        import sklearn.metrics.pairwise  # noqa: F401
+        import nltk  # noqa: F401
+    import main  # noqa: F401
+    from pdf_parser import EnhancedPDFParser
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        next(EnhancedPDFParser().iter_page_sections(doc), None)
+    print(time.time())
+
+
+def measure(pdf_path, eager):
+    start = time.time()
+    command = [sys.executable, os.path.abspath(__file__), '--child', pdf_path] + (['--eager'] if eager else [])
+    result = subprocess.run(command, check=True, capture_output=True, text=True, cwd=ROOT)
+    return float(result.stdout.strip().splitlines()[-1]) - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start to the first parsed page.")
+    parser.add_argument('--pdf', type=str, default=os.path.join(ROOT, 'Collection 1', 'PDFs', 'South of France - Cities.pdf'), help='PDF whose first page is parsed')
+    parser.add_argument('--repeats', type=int, default=5, help='Runs per mode (the fastest is reported)')
+    parser.add_argument('--child', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--eager', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.eager)
+        return
+    lazy = min(measure(args.pdf, eager=False) for _ in range(args.repeats))
+    eager = min(measure(args.pdf, eager=True) for _ in range(args.repeats))
+    print(f"first parsed page, lazy imports: {lazy:.2f}s")
+    print(f"first parsed page, eager model imports: {eager:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
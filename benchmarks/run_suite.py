@@ -0,0 +1,210 @@
+"""Reproducible benchmark suite over the bundled collections with regression gating.
+
+Each run executes main.py in a fresh process over a collection, either as shipped
+or with its PDFs replicated N times, and records parse throughput, embedding
+throughput, end-to-end latency and peak memory. Unscaled runs are also checked
+against the collection's stored challenge1b_output.json. Results are saved as
+JSON; pass a previous results file as --baseline to flag regressions.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fitz  # PyMuPDF
+
+# Metrics where a larger value is better; everything else gated is better when smaller
+HIGHER_IS_BETTER = {"parse_pages_per_s", "embed_sections_per_s"}
+GATED_METRICS = ["parse_pages_per_s", "embed_sections_per_s", "latency_s", "peak_rss_mb"]
+# Bumped whenever a metric's definition changes; baselines from another version are not gated
+METRICS_VERSION = 2
+
+
+def scaled_collection(input_path, scale, target_dir):
+    # Copies get distinct names so each replica is parsed and embedded as its own document
+    with open(input_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    source_dir = os.path.join(os.path.dirname(os.path.abspath(input_path)), 'PDFs')
+    os.makedirs(os.path.join(target_dir, 'PDFs'))
+    documents = []
+    for copy in range(scale):
+        for doc in config["documents"]:
+            stem, ext = os.path.splitext(doc["filename"])
+            filename = f"{stem} (copy {copy + 1}){ext}"
+            shutil.copyfile(os.path.join(source_dir, doc["filename"]), os.path.join(target_dir, 'PDFs', filename))
+            documents.append({"filename": filename, "title": doc.get("title", stem)})
+    config["documents"] = documents
+    scaled_input = os.path.join(target_dir, 'challenge1b_input.json')
+    with open(scaled_input, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    return scaled_input
+
+
+def count_pages(input_path):
+    with open(input_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(input_path))
+    pages = 0
+    for doc in config["documents"]:
+        with fitz.open(os.path.join(base_dir, 'PDFs', doc["filename"])) as pdf:
+            pages += len(pdf)
+    return len(config["documents"]), pages
+
+
+def run_pipeline(input_path, work_dir, extra_args):
+    output_path = os.path.join(work_dir, 'output.json')
+    report_path = os.path.join(work_dir, 'profile.json')
+    command = [sys.executable, os.path.join(ROOT, 'main.py'), '--input', input_path, '--output', output_path,
+               '--no-parse-cache', '--profile-report', report_path] + extra_args
+    start = time.perf_counter()
+    subprocess.run(command, check=True, cwd=ROOT, stdout=subprocess.DEVNULL)
+    latency = time.perf_counter() - start
+    with open(report_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    with open(output_path, 'r', encoding='utf-8') as f:
+        output = json.load(f)
+    return latency, report, output
+
+
+def compare_rankings(output, expected):
+    # Timestamps differ run to run; everything that reflects ranking must match exactly
+    mismatches = []
+    for key in ("extracted_sections", "subsection_analysis"):
+        actual_items, expected_items = output.get(key, []), expected.get(key, [])
+        if len(actual_items) != len(expected_items):
+            mismatches.append(f"{key}: {len(actual_items)} entries, expected {len(expected_items)}")
+        for i, (actual, wanted) in enumerate(zip(actual_items, expected_items)):
+            if actual != wanted:
+                mismatches.append(f"{key}[{i}]")
+    return mismatches
+
+
+def benchmark(input_path, scale, repeats, extra_args):
+    name = f"{os.path.basename(os.path.dirname(os.path.abspath(input_path)))} x{scale}"
+    with tempfile.TemporaryDirectory() as work_dir:
+        run_input = input_path if scale == 1 else scaled_collection(input_path, scale, os.path.join(work_dir, 'collection'))
+        documents, pages = count_pages(run_input)
+        runs = [run_pipeline(run_input, work_dir, extra_args) for _ in range(repeats)]
+    latency, report, output = min(runs, key=lambda run: run[0])
+    stages = report["stages"]
+    # Wall-clock parse phase; per-document times summed over workers give per-process throughput
+    parse_wall = stages.get("pipeline.parse", {}).get("wall", 0.0)
+    worker_parse_wall = stages.get("parse.document", {}).get("wall", 0.0)
+    # Section encodes only: key sentences and the task context are encoded too but aren't sections
+    sections = report["encode"]["section_texts"]
+    section_wall = stages.get("embed.sections", {}).get("wall", 0.0)
+    result = {
+        "name": name,
+        "input": os.path.relpath(input_path, ROOT),
+        "scale": scale,
+        "documents": documents,
+        "pages": pages,
+        "sections_embedded": sections,
+        "texts_encoded": report["encode"]["texts"],
+        "parse_pages_per_s": round(pages / parse_wall, 2) if parse_wall else None,
+        "parse_pages_per_s_per_process": round(pages / worker_parse_wall, 2) if worker_parse_wall else None,
+        "embed_sections_per_s": round(sections / section_wall, 2) if section_wall else None,
+        "latency_s": round(latency, 3),
+        "pipeline_wall_s": report["wall_time"],
+        "peak_rss_mb": max(report["peak_rss_mb"].values()),
+        "ranking_check": None
+    }
+    expected_path = os.path.join(os.path.dirname(os.path.abspath(input_path)), 'challenge1b_output.json')
+    if scale == 1 and os.path.exists(expected_path):
+        with open(expected_path, 'r', encoding='utf-8') as f:
+            mismatches = compare_rankings(output, json.load(f))
+        result["ranking_check"] = {"matches": not mismatches, "mismatches": mismatches}
+    return result
+
+
+def find_regressions(results, baseline, tolerance):
+    previous = {run["name"]: run for run in baseline.get("runs", [])}
+    if previous and baseline.get("metrics_version") != METRICS_VERSION:
+        print(f"Baseline metrics version {baseline.get('metrics_version', 1)} differs from {METRICS_VERSION}; only ranking checks are gated.")
+        previous = {}
+    regressions = []
+    for run in results["runs"]:
+        if run["ranking_check"] is not None and not run["ranking_check"]["matches"]:
+            regressions.append(f"{run['name']}: ranking differs from stored output ({', '.join(run['ranking_check']['mismatches'][:5])})")
+        old = previous.get(run["name"])
+        if old is None:
+            continue
+        for metric in GATED_METRICS:
+            new_value, old_value = run.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append(f"{run['name']}: {metric} {old_value} -> {new_value} ({change:+.1%})")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and flag regressions.")
+    parser.add_argument('--collections', type=str, default=os.path.join(ROOT, 'Collection *', 'challenge1b_input.json'), help='Glob of input JSON files to benchmark')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10], help='Replication factors for each collection, e.g. 1 10 100')
+    parser.add_argument('--repeats', type=int, default=1, help='Runs per benchmark (the fastest is kept)')
+    parser.add_argument('--output', type=str, default='benchmark_results.json', help='Where to save results')
+    parser.add_argument('--baseline', type=str, default=None, help='Previous results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative slowdown or growth before a metric counts as a regression')
+    parser.add_argument('--pipeline-args', type=str, default='', help='Extra arguments passed to main.py, e.g. "--workers 4"')
+    args = parser.parse_args()
+
+    input_paths = sorted(glob.glob(args.collections))
+    results = {
+        "metrics_version": METRICS_VERSION,
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pipeline_args": args.pipeline_args,
+        "runs": []
+    }
+    for input_path in input_paths:
+        for scale in args.scales:
+            run = benchmark(input_path, scale, args.repeats, args.pipeline_args.split())
+            results["runs"].append(run)
+            check = run["ranking_check"]
+            status = "n/a" if check is None else ("match" if check["matches"] else "MISMATCH")
+            print(f"{run['name']:<20} pages {run['pages']:>6}  parse {run['parse_pages_per_s'] or 0:>8.1f} pages/s  "
+                  f"embed {run['embed_sections_per_s'] or 0:>8.1f} sections/s  latency {run['latency_s']:>7.2f}s  "
+                  f"peak {run['peak_rss_mb']:>7.1f} MB  ranking {status}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+    else:
+        regressions = find_regressions(results, {}, args.tolerance)
+    results["regressions"] = regressions
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+    if regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
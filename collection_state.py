@@ -0,0 +1,119 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import numpy as np
+from parse_cache import file_digest
+from pdf_parser import PARSER_VERSION
+
+STATE_VERSION = 2
+
+def _task_hash(task_context):
+    return hashlib.sha1(task_context.encode('utf-8')).hexdigest()
+
+class CollectionState:
+    """Per-document sections, embeddings and semantic scores from a collection's last run.
+
+    ``state.json`` records each document's sections, file size, mtime and content
+    hash; embeddings and scores, tagged with a hash of the task they were computed
+    for, live in one ``<digest>.npz`` per document. A rerun reuses every document whose content
+    is unchanged, so only added or replaced PDFs are parsed, embedded and scored.
+    """
+
+    def __init__(self, state_dir, model_name):
+        # Stored per model and backend, like the embedding cache
+        self.state_dir = os.path.join(state_dir, re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name))
+        self.model_name = model_name
+        self.path = os.path.join(self.state_dir, 'state.json')
+        self.task_context = None
+        self.documents = {}
+        os.makedirs(self.state_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        # Another model or parser produces different embeddings or sections: start over
+        if (state.get("version") != STATE_VERSION or state.get("model") != self.model_name
+                or state.get("parser_version") != PARSER_VERSION):
+            return
+        self.task_context = state.get("task_context")
+        self.documents = state.get("documents", {})
+
+    def _arrays_path(self, digest):
+        return os.path.join(self.state_dir, f"{digest}.npz")
+
+    def lookup(self, pdf_path, abs_pdf_path, task_context):
+        """Return (sections, embeddings, semantic_scores) for an unchanged document, else None.
+
+        semantic_scores is None when they were computed for a different task.
+        """
+        entry = self.documents.get(pdf_path)
+        if entry is None:
+            return None
+        stat = os.stat(abs_pdf_path)
+        # Size and mtime unchanged means the content is too; otherwise compare hashes
+        if [stat.st_size, stat.st_mtime_ns] != entry["stat"]:
+            if file_digest(abs_pdf_path) != entry["digest"]:
+                return None
+            entry["stat"] = [stat.st_size, stat.st_mtime_ns]
+        try:
+            with np.load(self._arrays_path(entry["digest"])) as arrays:
+                embeddings, semantic_scores = arrays["embeddings"], arrays["semantic_scores"]
+                scored_task = str(arrays["task"])
+        except (OSError, KeyError, ValueError):
+            return None
+        if len(embeddings) != len(entry["sections"]):
+            return None
+        # The scores file names its own task, so a run that died before save() can't mislabel them
+        if scored_task != _task_hash(task_context):
+            semantic_scores = None
+        return [dict(section) for section in entry["sections"]], embeddings, semantic_scores
+
+    def update(self, pdf_path, abs_pdf_path, sections, embeddings, semantic_scores, task_context):
+        stat = os.stat(abs_pdf_path)
+        digest = file_digest(abs_pdf_path)
+        self._store_arrays(digest, embeddings, semantic_scores, task_context)
+        self.documents[pdf_path] = {
+            "digest": digest,
+            "stat": [stat.st_size, stat.st_mtime_ns],
+            "sections": [{key: value for key, value in section.items() if key != 'relevance_score'} for section in sections]
+        }
+
+    def update_scores(self, pdf_path, embeddings, semantic_scores, task_context):
+        # Same document, new task: only the stored scores change
+        entry = self.documents[pdf_path]
+        self._store_arrays(entry["digest"], embeddings, semantic_scores, task_context)
+
+    def _store_arrays(self, digest, embeddings, semantic_scores, task_context):
+        path = self._arrays_path(digest)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, embeddings=np.asarray(embeddings, dtype=np.float32),
+                     semantic_scores=np.asarray(semantic_scores, dtype=np.float32), task=np.array(_task_hash(task_context)))
+        os.replace(tmp_path, path)
+
+    def save(self, task_context, pdf_paths):
+        """Keep only the given documents, record the task their scores belong to and write the state."""
+        keep = set(pdf_paths)
+        self.documents = {pdf_path: entry for pdf_path, entry in self.documents.items() if pdf_path in keep}
+        self.task_context = task_context
+        state = {
+            "version": STATE_VERSION,
+            "model": self.model_name,
+            "parser_version": PARSER_VERSION,
+            "task_context": task_context,
+            "documents": self.documents
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        digests = set(entry["digest"] for entry in self.documents.values())
+        for path in glob.glob(os.path.join(self.state_dir, '*.npz')):
+            if os.path.splitext(os.path.basename(path))[0] not in digests:
+                os.remove(path)
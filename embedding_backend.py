@@ -0,0 +1,56 @@
+BACKENDS = ('torch', 'int8', 'onnx', 'onnx-int8')
+
+# Quantized ONNX export shipped with the model on the Hugging Face hub; AVX2 runs on any recent x86 CPU
+ONNX_INT8_FILE = 'onnx/model_quint8_avx2.onnx'
+
+def model_key(model_name, backend='torch'):
+    # Backends produce slightly different vectors, so caches and indexes must not mix them
+    return model_name if backend == 'torch' else f"{model_name}@{backend}"
+
+def load_model(model_name, backend='torch', threads=None, interop_threads=None):
+    """Load a SentenceTransformer with the given backend.
+
+    'torch' is the full-precision model on SentenceTransformer's default device; 'int8'
+    applies PyTorch dynamic int8 quantization to its linear layers and 'onnx' and
+    'onnx-int8' run the model's ONNX exports with ONNX Runtime (requires
+    optimum[onnxruntime]), all three on CPU.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    import torch
+    from sentence_transformers import SentenceTransformer
+    _set_torch_threads(torch, threads, interop_threads)
+    if backend == 'torch':
+        return SentenceTransformer(model_name)
+    if backend == 'int8':
+        # Dynamic quantization only runs on CPU; in place, so the full-precision weights are not kept alongside a quantized copy
+        model = SentenceTransformer(model_name, device='cpu')
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return model
+    model_kwargs = {'provider': 'CPUExecutionProvider', 'session_options': _onnx_session_options(threads, interop_threads)}
+    if backend == 'onnx-int8':
+        model_kwargs['file_name'] = ONNX_INT8_FILE
+    return SentenceTransformer(model_name, device='cpu', backend='onnx', model_kwargs=model_kwargs)
+
+def _set_torch_threads(torch, threads, interop_threads):
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Only allowed once, before any inter-op parallel work has started in this process
+            print(f"Inter-op thread count already fixed at {torch.get_num_interop_threads()}; ignoring --interop-threads.")
+
+def _onnx_session_options(threads, interop_threads):
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError("The onnx backends need ONNX Runtime: pip install 'optimum[onnxruntime]'") from e
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    if interop_threads:
+        options.inter_op_num_threads = interop_threads
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+    return options
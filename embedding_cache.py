@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class MemoryEmbeddingCache:
+    """In-process embedding cache with the same interface as EmbeddingCache, for single long runs.
+
+    With ``max_entries`` set, the least recently used embeddings are evicted past that many.
+    """
+
+    dtype = np.float32
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        # Least recently used first, so eviction pops from the front
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def lookup(self, texts):
+        embeddings = [None] * len(texts)
+        missing = []
+        with self.lock:
+            for i, text in enumerate(texts):
+                embedding = self.entries.get(text)
+                if embedding is None:
+                    missing.append(i)
+                else:
+                    self.entries.move_to_end(text)
+                    embeddings[i] = embedding
+        return embeddings, missing
+
+    def store(self, texts, embeddings):
+        with self.lock:
+            for text, embedding in zip(texts, np.asarray(embeddings, dtype=np.float32)):
+                self.entries[text] = embedding
+                self.entries.move_to_end(text)
+            if self.max_entries is not None:
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+    def flush(self):
+        pass
+
+    def __len__(self):
+        return len(self.entries)
+
+class EmbeddingCache:
+    """Content-addressed, memory-mapped store of float16 embeddings with LRU eviction.
+
+    Vectors live in one ``embeddings.f16`` matrix per model; ``index.json`` maps the
+    hash of each text to its row and the logical time it was last used. Rows of
+    evicted entries are only reused once an index without them has been written,
+    since writes to the memmap reach the file even if ``flush`` never runs.
+    """
+
+    dtype = np.float16
+
+    def __init__(self, cache_dir, model_name, max_entries=200000):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.model_name = model_name
+        self.max_entries = max_entries
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.directory = os.path.join(cache_dir, safe_name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.index_path = os.path.join(self.directory, 'index.json')
+        self.matrix_path = os.path.join(self.directory, 'embeddings.f16')
+        self.lock = threading.Lock()
+        self.dim = None
+        self.capacity = 0
+        self.clock = 0
+        # Least recently used first, so eviction pops from the front
+        self.entries = OrderedDict()
+        self.free_slots = []
+        # Evicted rows the index on disk may still point at; reusable after the next flush
+        self.released_slots = []
+        self.matrix = None
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if index.get("model") != self.model_name or not os.path.exists(self.matrix_path):
+            return
+        self.dim = index["dim"]
+        self.capacity = index["capacity"]
+        self.clock = index["clock"]
+        self.entries = OrderedDict(sorted(((key, list(value)) for key, value in index["entries"].items()), key=lambda item: item[1][1]))
+        self.matrix = np.memmap(self.matrix_path, dtype=np.float16, mode='r+', shape=(self.capacity, self.dim))
+        used = set(slot for slot, _ in self.entries.values())
+        self.free_slots = [slot for slot in range(self.capacity - 1, -1, -1) if slot not in used]
+        # Honour a smaller size cap than the one the cache was written with
+        if len(self.entries) > self.max_entries:
+            self._evict(len(self.entries) - self.max_entries)
+
+    def _key(self, text):
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def lookup(self, texts):
+        """Return (embeddings, missing) where embeddings[i] is None for every index in missing."""
+        embeddings = [None] * len(texts)
+        missing = []
+        with self.lock:
+            for i, text in enumerate(texts):
+                key = self._key(text)
+                entry = self.entries.get(key)
+                if entry is None:
+                    missing.append(i)
+                    continue
+                self.clock += 1
+                entry[1] = self.clock
+                self.entries.move_to_end(key)
+                embeddings[i] = np.asarray(self.matrix[entry[0]], dtype=np.float32)
+            if len(missing) < len(texts):
+                self.dirty = True
+        return embeddings, missing
+
+    def store(self, texts, embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float16)
+        if len(texts) == 0:
+            return
+        with self.lock:
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+            pending = {}
+            for text, embedding in zip(texts, embeddings):
+                key = self._key(text)
+                if key not in self.entries:
+                    pending[key] = embedding
+            # Never try to keep more than the cap allows from a single oversized store
+            pending = dict(list(pending.items())[-self.max_entries:])
+            if not pending:
+                return
+            self._reserve(len(pending))
+            for key, embedding in pending.items():
+                slot = self.free_slots.pop()
+                self.clock += 1
+                self.matrix[slot] = embedding
+                self.entries[key] = [slot, self.clock]
+            self.dirty = True
+
+    def _reserve(self, count):
+        overflow = len(self.entries) + count - self.max_entries
+        if overflow > 0:
+            self._evict(overflow)
+        if len(self.free_slots) < count:
+            self._grow(self.capacity + count - len(self.free_slots))
+
+    def _evict(self, count):
+        for _ in range(min(count, len(self.entries))):
+            _, (slot, _) = self.entries.popitem(last=False)
+            self.released_slots.append(slot)
+        self.dirty = True
+
+    def _grow(self, required):
+        # Past max_entries only while released rows wait for a flush
+        new_capacity = max(required, min(self.max_entries, max(self.capacity * 2, 1024)))
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+        with open(self.matrix_path, 'ab') as f:
+            f.truncate(new_capacity * self.dim * np.dtype(np.float16).itemsize)
+        self.matrix = np.memmap(self.matrix_path, dtype=np.float16, mode='r+', shape=(new_capacity, self.dim))
+        self.free_slots = list(range(new_capacity - 1, self.capacity - 1, -1)) + self.free_slots
+        self.capacity = new_capacity
+
+    def flush(self):
+        with self.lock:
+            if not self.dirty or self.matrix is None:
+                return
+            self.matrix.flush()
+            index = {
+                "model": self.model_name,
+                "dim": self.dim,
+                "capacity": self.capacity,
+                "clock": self.clock,
+                "entries": self.entries
+            }
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+            self.free_slots.extend(self.released_slots)
+            self.released_slots = []
+
+    def __len__(self):
+        return len(self.entries)
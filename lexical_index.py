@@ -0,0 +1,61 @@
+import math
+import re
+import numpy as np
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him his how
+i if in into is it its itself just me more most my need no nor not now of off on once only or other our ours out over
+own same she should so some such than that the their theirs them then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would you your yours
+""".split())
+
+def tokenize(text):
+    return [token for token in re.findall(r'[a-z0-9]+', text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """In-memory inverted index over a list of texts, scored with Okapi BM25.
+
+    Each term maps to the ids of the texts containing it and its frequency in each,
+    so a query only touches the postings of its own terms.
+    """
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(texts)
+        postings = {}
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[doc_id] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, ([], []))
+                postings[token][0].append(doc_id)
+                postings[token][1].append(count)
+        self.postings = {token: (np.array(ids, dtype=np.int64), np.array(counts, dtype=np.float32))
+                         for token, (ids, counts) in postings.items()}
+        average_length = lengths.mean() if self.size else 0.0
+        # Per-text BM25 length normalization, computed once
+        self.norms = k1 * (1 - b + b * lengths / average_length) if average_length > 0 else np.full(self.size, k1, dtype=np.float32)
+
+    def scores(self, query):
+        scores = np.zeros(self.size, dtype=np.float32)
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            ids, counts = posting
+            # Lucene's IDF, which stays positive for terms found in most texts
+            idf = math.log(1 + (self.size - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += idf * counts * (self.k1 + 1) / (counts + self.norms[ids])
+        return scores
+
+    def search(self, query, top_n):
+        """Ids of the top_n highest-scoring texts, in their original order; ties keep the earliest."""
+        if top_n >= self.size:
+            return np.arange(self.size)
+        return np.sort(np.argsort(-self.scores(query), kind='stable')[:top_n])
@@ -2,10 +2,25 @@ import json
 import time
 import os
 import argparse
-from pdf_parser import EnhancedPDFParser
-from analysis_engine import PersonaDrivenAnalyzer
+import cProfile
+import numpy as np
+from parallel_parser import iter_parse_documents
+from analysis_engine import PersonaDrivenAnalyzer, MODEL_NAME
+from embedding_backend import BACKENDS, model_key
+from embedding_cache import EmbeddingCache
+from parse_cache import ParseCache
+from collection_state import CollectionState
+from vector_index import SectionIndex
+from pipeline import EmbeddingStage
+from profiling import Profiler, NULL_PROFILER
 from output_generator import generate_final_output
 
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
 def load_challenge_input(input_path):
     try:
         with open(input_path, 'r', encoding='utf-8') as f:
@@ -21,11 +36,8 @@ def resolve_pdf_path(pdf_path, input_json_path):
     base_dir = os.path.dirname(os.path.abspath(input_json_path))
     return os.path.join(base_dir, pdf_path)
 
-def process_pipeline(task_context, documents, input_json_path, metadata):
-    parser = EnhancedPDFParser()
-    analyzer = PersonaDrivenAnalyzer()
-    all_sections = []
-    processed_docs = []
+def resolve_documents(documents, input_json_path):
+    resolved = []
     for doc in documents:
         pdf_path = doc.get("path")
         if not pdf_path:
@@ -41,18 +53,178 @@ def process_pipeline(task_context, documents, input_json_path, metadata):
         if not os.path.exists(abs_pdf_path):
             print(f"Missing or invalid PDF path: {abs_pdf_path}")
             continue
-        try:
-            sections = parser.extract_structured_content(abs_pdf_path)
-            for section in sections:
-                section["document"] = os.path.basename(pdf_path)
-            all_sections.extend(sections)
-            processed_docs.append(doc)
-        except Exception as e:
-            print(f"Error parsing {abs_pdf_path}: {e}")
+        resolved.append((doc, pdf_path, abs_pdf_path))
+    return resolved
+
+def open_parse_cache(input_json_path, cache_dir=None):
+    return ParseCache(cache_dir or os.path.join(os.path.dirname(os.path.abspath(input_json_path)), '.parse_cache'))
+
+def prepare_job(input_config):
+    persona = input_config["persona"]["role"]
+    job_task = input_config["job_to_be_done"]["task"]
+    documents = input_config["documents"]
+    task_context = f"As a {persona}, I need to {job_task}"
+    metadata = {
+        "persona": persona,
+        "job_to_be_done": job_task,
+        "documents": [] # Will be populated by the pipeline
+    }
+    return task_context, documents, metadata
+
+def prepare_jobs(input_config):
+    # A "personas" list of persona/job_to_be_done pairs ranks one document set for each of them
+    if "personas" not in input_config:
+        task_context, documents, metadata = prepare_job(input_config)
+        return [(task_context, metadata)], documents
+    jobs = []
+    for entry in input_config["personas"]:
+        task_context, documents, metadata = prepare_job(dict(input_config, persona=entry["persona"], job_to_be_done=entry["job_to_be_done"]))
+        jobs.append((task_context, metadata))
+    return jobs, input_config["documents"]
+
+def process_pipeline(task_context, documents, input_json_path, metadata, batch_size=64, embedding_cache=None, workers=1, parse_cache=None, analyzer=None, timings=None, section_index=None, candidate_count=200, overlap=True, queue_size=1024, profiler=NULL_PROFILER, backend='torch', threads=None, interop_threads=None, collection_state=None, lexical_candidates=None):
+    if analyzer is None:
+        analyzer = PersonaDrivenAnalyzer(batch_size=batch_size, embedding_cache=embedding_cache,
+                                         section_index=section_index, candidate_count=candidate_count, profiler=profiler,
+                                         backend=backend, threads=threads, interop_threads=interop_threads,
+                                         lexical_candidates=lexical_candidates)
+    # Load the model in the background while the first documents are parsed
+    analyzer.warm_up()
+    # Embed each document's sections while the next documents are still being parsed. The lexical
+    # pre-filter needs every section before it can pick candidates, so it embeds after parsing
+    if analyzer.lexical_candidates and collection_state is None:
+        overlap = False
+    # With a section index, only sections it hasn't seen yet need embedding; the collection
+    # state still needs a vector for every freshly parsed section
+    streamed_index = analyzer.section_index if collection_state is None else None
+    embedder = EmbeddingStage(analyzer, micro_batch=analyzer.batch_size, max_queue=queue_size,
+                              section_index=streamed_index) if overlap else None
+    stage_start = time.time()
+    cpu_start = time.thread_time()
+    resolved = resolve_documents(documents, input_json_path)
+    # Documents unchanged since the collection state was saved skip parsing, embedding and scoring
+    reused = {}
+    if collection_state is not None:
+        for _, pdf_path, abs_pdf_path in resolved:
+            with profiler.stage("state.lookup", document=abs_pdf_path):
+                entry = collection_state.lookup(pdf_path, abs_pdf_path, task_context)
+            if entry is not None:
+                reused[pdf_path] = entry
+    all_sections, processed_docs, document_sections, fresh_sections = parse_documents(resolved, reused, embedder, workers, parse_cache, profiler)
     metadata["documents"] = processed_docs
-    ranked_sections, subsection_analyses = analyzer.analyze_document_collection(task_context, all_sections)
+    parse_end, parse_cpu_end = time.time(), time.thread_time()
+    section_embeddings = embedder.finish() if embedder is not None else None
+    if embedder is not None and streamed_index is not None:
+        # Index the new sections now; candidate retrieval then reads every vector from the index
+        if embedder.keys:
+            streamed_index.add(embedder.keys, section_embeddings)
+        section_embeddings = None
+    embed_end, embed_cpu_end = time.time(), time.thread_time()
+    semantic_scores = task_embedding = None
+    if collection_state is not None:
+        if section_embeddings is None:
+            section_embeddings = analyzer._embed_sections(fresh_sections)
+        task_embedding = analyzer.embed_task(task_context)
+        with profiler.stage("state.update"):
+            semantic_scores = update_collection_state(collection_state, analyzer, task_context, task_embedding,
+                                                      document_sections, reused, section_embeddings)
+    ranked_sections, subsection_analyses = analyzer.analyze_document_collection(task_context, all_sections, section_embeddings=section_embeddings,
+                                                                                semantic_scores=semantic_scores, task_embedding=task_embedding)
+    if analyzer.embedding_cache is not None:
+        analyzer.embedding_cache.flush()
+    if analyzer.section_index is not None:
+        analyzer.section_index.save()
+    analyze_end = time.time()
+    profiler.add("pipeline.parse", parse_end - stage_start, parse_cpu_end - cpu_start)
+    profiler.add("pipeline.embed_wait", embed_end - parse_end, embed_cpu_end - parse_cpu_end)
+    profiler.add("pipeline.analyze", analyze_end - embed_end, time.thread_time() - embed_cpu_end)
+    if timings is not None:
+        timings["parse"] = timings.get("parse", 0.0) + parse_end - stage_start
+        timings["embed_wait"] = timings.get("embed_wait", 0.0) + embed_end - parse_end
+        timings["analyze"] = timings.get("analyze", 0.0) + analyze_end - embed_end
     return ranked_sections, subsection_analyses, metadata
 
+def parse_documents(resolved, reused, embedder, workers, parse_cache, profiler):
+    # Sections of every document in input order; documents not reused from a collection
+    # state are parsed and their sections handed to the embedding stage, if there is one
+    all_sections = []
+    processed_docs = []
+    parsed = iter_parse_documents([abs_pdf_path for _, pdf_path, abs_pdf_path in resolved if pdf_path not in reused], workers=workers,
+                                  parse_cache=parse_cache, profiler=profiler)
+    document_sections = []
+    fresh_sections = []
+    for doc, pdf_path, abs_pdf_path in resolved:
+        if pdf_path in reused:
+            sections = reused[pdf_path][0]
+        else:
+            _, sections, error = next(parsed)
+            if error is not None:
+                print(f"Error parsing {abs_pdf_path}: {error}")
+                continue
+            for section in sections:
+                section["document"] = os.path.basename(pdf_path)
+            fresh_sections.extend(sections)
+            if embedder is not None:
+                embedder.put(sections)
+        all_sections.extend(sections)
+        processed_docs.append(doc)
+        document_sections.append((pdf_path, abs_pdf_path, sections))
+    return all_sections, processed_docs, document_sections, fresh_sections
+
+def update_collection_state(collection_state, analyzer, task_context, task_embedding, document_sections, reused, fresh_embeddings):
+    # Score only new or changed documents (and reused ones whose scores belong to another task),
+    # then return every section's semantic score in document order
+    scores = []
+    offset = 0
+    for pdf_path, abs_pdf_path, sections in document_sections:
+        if pdf_path in reused:
+            _, embeddings, document_scores = reused[pdf_path]
+            if document_scores is None:
+                document_scores = analyzer._semantic_scores(task_embedding, embeddings)
+                collection_state.update_scores(pdf_path, embeddings, document_scores, task_context)
+        else:
+            embeddings = fresh_embeddings[offset:offset + len(sections)]
+            offset += len(sections)
+            document_scores = analyzer._semantic_scores(task_embedding, embeddings)
+            collection_state.update(pdf_path, abs_pdf_path, sections, embeddings, document_scores, task_context)
+        scores.append(document_scores)
+    collection_state.save(task_context, [pdf_path for pdf_path, _, _ in document_sections])
+    return np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+
+def process_personas_pipeline(jobs, documents, input_json_path, batch_size=64, embedding_cache=None, workers=1, parse_cache=None, analyzer=None, overlap=True, queue_size=1024, profiler=NULL_PROFILER, backend='torch', threads=None, interop_threads=None):
+    """Parse and embed the documents once, then rank them for every (task_context, metadata) job."""
+    if analyzer is None:
+        analyzer = PersonaDrivenAnalyzer(batch_size=batch_size, embedding_cache=embedding_cache, profiler=profiler,
+                                         backend=backend, threads=threads, interop_threads=interop_threads)
+    analyzer.warm_up()
+    embedder = EmbeddingStage(analyzer, micro_batch=analyzer.batch_size, max_queue=queue_size) if overlap else None
+    stage_start = time.time()
+    cpu_start = time.thread_time()
+    resolved = resolve_documents(documents, input_json_path)
+    all_sections, processed_docs, _, _ = parse_documents(resolved, {}, embedder, workers, parse_cache, profiler)
+    parse_end, parse_cpu_end = time.time(), time.thread_time()
+    section_embeddings = embedder.finish() if embedder is not None else None
+    embed_end, embed_cpu_end = time.time(), time.thread_time()
+    rankings = analyzer.analyze_personas([task_context for task_context, _ in jobs], all_sections, section_embeddings=section_embeddings)
+    if analyzer.embedding_cache is not None:
+        analyzer.embedding_cache.flush()
+    profiler.add("pipeline.parse", parse_end - stage_start, parse_cpu_end - cpu_start)
+    profiler.add("pipeline.embed_wait", embed_end - parse_end, embed_cpu_end - parse_cpu_end)
+    profiler.add("pipeline.analyze", time.time() - embed_end, time.thread_time() - embed_cpu_end)
+    results = []
+    for (_, metadata), (ranked_sections, subsection_analyses) in zip(jobs, rankings):
+        metadata["documents"] = processed_docs
+        results.append((ranked_sections, subsection_analyses, metadata))
+    return results
+
+def persona_output_path(output_path, index, entry):
+    # Persona entries may name their own output file; otherwise outputs are numbered after --output
+    directory = os.path.dirname(output_path)
+    if entry.get("output"):
+        return os.path.join(directory, entry["output"])
+    stem, ext = os.path.splitext(os.path.basename(output_path))
+    return os.path.join(directory, f"{stem}_{index + 1}{ext or '.json'}")
+
 def generate_output(results, output_path):
     ranked_sections, subsection_analyses, metadata = results
     generate_final_output(ranked_sections, subsection_analyses, metadata, output_path)
@@ -61,25 +233,79 @@ def main():
     parser = argparse.ArgumentParser(description="Persona-driven PDF analysis pipeline.")
     parser.add_argument('--input', type=str, default='challenge1b_input.json', help='Path to input JSON file')
     parser.add_argument('--output', type=str, default='challenge1b_output.json', help='Path to output JSON file')
+    parser.add_argument('--batch-size', type=int, default=64, help='Number of sections encoded per model batch')
+    parser.add_argument('--embedding-cache', type=str, default=None, help='Directory for the persistent embedding cache (disabled if omitted)')
+    parser.add_argument('--embedding-cache-size', type=positive_int, default=200000, help='Maximum number of embeddings kept in the cache')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes used to parse PDFs (0 uses every core)')
+    parser.add_argument('--parse-cache', type=str, default=None, help='Directory for cached parsed sections (defaults to .parse_cache next to the input JSON)')
+    parser.add_argument('--no-parse-cache', action='store_true', help='Parse every PDF from scratch without reading or writing the parse cache')
+    parser.add_argument('--clear-parse-cache', action='store_true', help='Delete cached parsed sections before running')
+    parser.add_argument('--section-index', type=str, default=None, help='Directory for a persistent ANN index over section embeddings (exhaustive scoring if omitted)')
+    parser.add_argument('--candidates', type=int, default=200, help='Sections retrieved from the section index for full re-ranking')
+    parser.add_argument('--no-overlap', action='store_true', help='Parse every PDF before embedding instead of overlapping the two stages')
+    parser.add_argument('--queue-size', type=int, default=1024, help='Maximum parsed sections waiting to be embedded')
+    parser.add_argument('--lexical-candidates', type=int, default=None, help='Embed only this many sections, chosen by BM25 against the persona and task (all sections if omitted)')
+    parser.add_argument('--collection-state', type=str, default=None, help='Directory holding per-document sections, embeddings and scores from the last run, so reruns only process new or changed PDFs')
+    parser.add_argument('--backend', type=str, choices=BACKENDS, default='torch', help='Embedding inference backend: full-precision PyTorch, int8-quantized PyTorch, or ONNX Runtime (fp32 or int8)')
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op threads used by the embedding backend (library default if omitted)')
+    parser.add_argument('--interop-threads', type=int, default=None, help='Inter-op threads used by the embedding backend (library default if omitted)')
+    parser.add_argument('--profile-report', type=str, default=None, help='Write a JSON report of per-stage and per-document timings, encoder statistics and peak RSS')
+    parser.add_argument('--profile-dump', type=str, default=None, help='Write cProfile statistics of the main process to this file')
     args = parser.parse_args()
 
     input_path = args.input
     output_path = args.output
     input_config = load_challenge_input(input_path)
-    persona = input_config["persona"]["role"]
-    job_task = input_config["job_to_be_done"]["task"]
-    documents = input_config["documents"]
-    task_context = f"As a {persona}, I need to {job_task}"
-    metadata = {
-        "persona": persona,
-        "job_to_be_done": job_task,
-        "documents": [] # Will be populated by the pipeline
-    }
+    jobs, documents = prepare_jobs(input_config)
+    multi_persona = "personas" in input_config
+    if multi_persona and (args.section_index or args.collection_state or args.lexical_candidates):
+        print("--section-index, --collection-state and --lexical-candidates are ignored for multi-persona inputs; every section is scored.")
+    elif args.collection_state and args.lexical_candidates:
+        print("--lexical-candidates is ignored with --collection-state; every section is scored.")
+    embedding_cache = None
+    if args.embedding_cache:
+        embedding_cache = EmbeddingCache(args.embedding_cache, model_key(MODEL_NAME, args.backend), max_entries=args.embedding_cache_size)
+    section_index = None
+    if args.section_index:
+        section_index = SectionIndex(args.section_index, model_key(MODEL_NAME, args.backend))
+    collection_state = None
+    if args.collection_state:
+        collection_state = CollectionState(args.collection_state, model_key(MODEL_NAME, args.backend))
+    parse_cache = None
+    if not args.no_parse_cache:
+        parse_cache = open_parse_cache(input_path, args.parse_cache)
+        if args.clear_parse_cache:
+            print(f"Removed {parse_cache.clear()} cached parse(s) from {parse_cache.cache_dir}")
+    profiler = Profiler() if args.profile_report else NULL_PROFILER
+    cprofile = None
+    if args.profile_dump:
+        cprofile = cProfile.Profile()
+        cprofile.enable()
     start_time = time.time()
-    results = process_pipeline(task_context, documents, input_path, metadata)
+    if multi_persona:
+        all_results = process_personas_pipeline(jobs, documents, input_path, batch_size=args.batch_size, embedding_cache=embedding_cache, workers=args.workers, parse_cache=parse_cache,
+                                                 overlap=not args.no_overlap, queue_size=args.queue_size, profiler=profiler,
+                                                 backend=args.backend, threads=args.threads, interop_threads=args.interop_threads)
+        output_paths = [persona_output_path(output_path, i, entry) for i, entry in enumerate(input_config["personas"])]
+    else:
+        task_context, metadata = jobs[0]
+        all_results = [process_pipeline(task_context, documents, input_path, metadata, batch_size=args.batch_size, embedding_cache=embedding_cache, workers=args.workers, parse_cache=parse_cache,
+                                        section_index=section_index, candidate_count=args.candidates,
+                                        overlap=not args.no_overlap, queue_size=args.queue_size, profiler=profiler,
+                                        backend=args.backend, threads=args.threads, interop_threads=args.interop_threads,
+                                        collection_state=collection_state, lexical_candidates=args.lexical_candidates)]
+        output_paths = [output_path]
     elapsed = time.time() - start_time
     print(f"Processing completed in {elapsed:.2f} seconds.")
-    generate_output(results, output_path)
+    with profiler.stage("output.write"):
+        for results, path in zip(all_results, output_paths):
+            generate_output(results, path)
+    if cprofile is not None:
+        cprofile.disable()
+        cprofile.dump_stats(args.profile_dump)
+    if profiler.enabled:
+        with open(args.profile_report, 'w', encoding='utf-8') as f:
+            json.dump(profiler.report(), f, indent=2)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
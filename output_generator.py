@@ -8,7 +8,7 @@ def create_minimal_valid_output(metadata):
         "subsection_analysis": []
     }
 
-def generate_final_output(ranked_sections, subsection_analyses, metadata, output_path):
+def build_output(ranked_sections, subsection_analyses, metadata):
     max_sections = min(20, len(ranked_sections))
     
     # Extract just the filenames from the documents for the expected format
@@ -39,6 +39,10 @@ def generate_final_output(ranked_sections, subsection_analyses, metadata, output
         ],
         "subsection_analysis": subsection_analyses[:15]
     }
+    return output_data
+
+def generate_final_output(ranked_sections, subsection_analyses, metadata, output_path):
+    output_data = build_output(ranked_sections, subsection_analyses, metadata)
     try:
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(output_data, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pdf_parser import EnhancedPDFParser
+from parse_cache import file_digest
+from profiling import Profiler, NULL_PROFILER
+
+_worker_parser = None
+_worker_profile = False
+
+def _init_worker(profile=False):
+    global _worker_parser, _worker_profile
+    _worker_parser = EnhancedPDFParser()
+    _worker_profile = profile
+
+def _parse_document(pdf_path):
+    # Exceptions are returned rather than raised so one bad PDF doesn't cancel the pool.
+    # Profiling runs per document and travels back with the result, since workers
+    # can't write into the parent's profiler
+    profiler = Profiler() if _worker_profile else NULL_PROFILER
+    _worker_parser.profiler = profiler
+    try:
+        with profiler.stage("parse.document"):
+            sections = _worker_parser.extract_structured_content(pdf_path)
+        error = None
+    except Exception as e:
+        sections, error = None, e
+    return sections, error, profiler.report() if profiler.enabled else None
+
+def resolve_workers(workers):
+    # 0 means one worker per available core
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+def iter_parse_documents(pdf_paths, workers=1, parse_cache=None, profiler=NULL_PROFILER):
+    """Parse PDFs and yield (pdf_path, sections, error) tuples in input order."""
+    cached = {}
+    digests = {}
+    if parse_cache is not None:
+        for pdf_path in pdf_paths:
+            with profiler.stage("parse.cache_lookup", document=pdf_path):
+                try:
+                    digest = file_digest(pdf_path)
+                except OSError:
+                    # Unreadable: skip the cache and let the normal parse report the error
+                    continue
+                digests[pdf_path] = digest
+                sections = parse_cache.load(digest)
+            if sections is not None:
+                cached[pdf_path] = sections
+    pending = [pdf_path for pdf_path in pdf_paths if pdf_path not in cached]
+    for pdf_path, sections, error, report in _iter_parse_uncached(pending, cached, pdf_paths, workers, profiler.enabled):
+        if report is not None:
+            profiler.merge(report, document=pdf_path)
+        if parse_cache is not None and error is None and pdf_path not in cached and pdf_path in digests:
+            parse_cache.store(digests[pdf_path], sections)
+        yield pdf_path, sections, error
+
+def _iter_parse_uncached(pending, cached, pdf_paths, workers, profile):
+    workers = min(resolve_workers(workers), len(pending))
+    if workers <= 1:
+        if pending:
+            _init_worker(profile)
+        for pdf_path in pdf_paths:
+            if pdf_path in cached:
+                yield pdf_path, cached[pdf_path], None, None
+                continue
+            yield (pdf_path,) + _parse_document(pdf_path)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(profile,)) as pool:
+        futures = {pdf_path: pool.submit(_parse_document, pdf_path) for pdf_path in pending}
+        for pdf_path in pdf_paths:
+            if pdf_path in cached:
+                yield pdf_path, cached[pdf_path], None, None
+                continue
+            yield (pdf_path,) + futures[pdf_path].result()
@@ -0,0 +1,88 @@
+import glob
+import hashlib
+import json
+import os
+from pdf_parser import PARSER_VERSION
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ParseCache:
+    """Stores extracted sections as JSONL, one file per PDF content hash and parser version."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.writable = True
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            self._disable_writes(e)
+
+    def _disable_writes(self, error):
+        # A read-only or full disk must not fail the run; carry on without storing parses
+        if self.writable:
+            print(f"Parse cache {self.cache_dir} is not writable ({error}); continuing without storing parsed sections.")
+        self.writable = False
+
+    def _entry_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}-v{PARSER_VERSION}.jsonl")
+
+    def load(self, digest):
+        try:
+            with open(self._entry_path(digest), 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def store(self, digest, sections):
+        if not self.writable:
+            return
+        path = self._entry_path(digest)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for section in sections:
+                    f.write(json.dumps(section, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self._disable_writes(e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        removed = 0
+        for path in glob.glob(os.path.join(self.cache_dir, '*.jsonl')):
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Could not remove cached parse {path}: {e}")
+                continue
+            removed += 1
+        return removed
+
+class MemoryParseCache:
+    """In-process parse cache, optionally in front of a ParseCache, for sharing parses across jobs."""
+
+    def __init__(self, backing=None, entries=None):
+        self.backing = backing
+        self.entries = {} if entries is None else entries
+
+    def load(self, digest):
+        sections = self.entries.get(digest)
+        if sections is None and self.backing is not None:
+            sections = self.backing.load(digest)
+            if sections is not None:
+                self.entries[digest] = sections
+        # Callers annotate sections in place, so never hand out the shared dicts
+        return [dict(section) for section in sections] if sections is not None else None
+
+    def store(self, digest, sections):
+        self.entries[digest] = [dict(section) for section in sections]
+        if self.backing is not None:
+            self.backing.store(digest, sections)
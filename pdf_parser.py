@@ -1,7 +1,41 @@
+import heapq
+import re
 import fitz  # PyMuPDF
+from profiling import NULL_PROFILER
+
+# Bump whenever a heuristic change alters extracted sections, so cached parses are invalidated
+PARSER_VERSION = 2
+
+# Text-only page dicts: image blocks never contribute to sections
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+class _TopSections:
+    """The max_sections most confident sections seen so far; ties keep the earliest, like a stable sort."""
+
+    def __init__(self, max_sections):
+        self.max_sections = max_sections
+        self.heap = []
+        self.count = 0
+
+    def push(self, section):
+        entry = (section["confidence_score"], -self.count, section)
+        self.count += 1
+        if len(self.heap) < self.max_sections:
+            heapq.heappush(self.heap, entry)
+        elif entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+
+    def sections(self):
+        return [entry[2] for entry in sorted(self.heap, key=lambda entry: (-entry[0], -entry[1]))]
+
+    def __len__(self):
+        return len(self.heap)
 
 class EnhancedPDFParser:
-    def __init__(self):
+    def __init__(self, max_sections=10, profiler=NULL_PROFILER):
+        # Sections kept per document, most confident first
+        self.max_sections = max_sections
+        self.profiler = profiler
         self.heading_indicators = {
             'font_size_jump': 2.0,      # Font size increase threshold
             'bold_weight': 600,         # Bold font weight
@@ -10,115 +44,135 @@ class EnhancedPDFParser:
         }
 
     def extract_structured_content(self, pdf_path):
-        sections = []
-        doc = fitz.open(pdf_path)
+        # Sections stream through a bounded top-k selection, so memory stays flat as page count grows
+        with fitz.open(pdf_path) as doc:
+            top_sections = _TopSections(self.max_sections)
+            meaningful_count = 0
+            repairable_count = 0
+            for section in self.iter_page_sections(doc):
+                top_sections.push(section)
+                # Title repair works section by section, so whether it would rescue the
+                # document can be counted on the fly; both counts only matter up to 2
+                if self._is_meaningful_title(section["section_title"]):
+                    meaningful_count += 1
+                    repairable_count += 1
+                elif repairable_count < 2:
+                    with self.profiler.stage("parse.title_repair"):
+                        repairable = self._is_meaningful_title(self._improved_title(section))
+                    if repairable:
+                        repairable_count += 1
+            # Only fallback if <2 real sections found
+            if meaningful_count >= 2:
+                return top_sections.sections()
+            if repairable_count >= 2:
+                with self.profiler.stage("parse.title_repair"):
+                    return self._improve_section_titles(top_sections.sections(), doc)
+            with self.profiler.stage("parse.fallback_segmentation"):
+                top_sections = _TopSections(self.max_sections)
+                for section in self._fallback_paragraph_segmentation(doc):
+                    top_sections.push(section)
+                return top_sections.sections()
+
+    def iter_page_sections(self, doc):
+        """Yield heading-delimited sections page by page, keeping only one page's blocks in memory."""
         for page_num, page in enumerate(doc):
-            blocks = page.get_text("dict")["blocks"]
-            for block in blocks:
-                if self._is_section_heading(block, blocks):
-                    section = self._extract_section_content(page, block, blocks)
-                    # Try to extract a meaningful section title
-                    title = section["title"]
-                    # --- ADVANCED HEADING EXTRACTION LOGIC ---
-                    if not title or title.lower().startswith("paragraph") or len(title.split()) < 2:
-                        # Try to extract heading from block itself (font size, bold, all-caps, etc.)
-                        heading_candidate = self._extract_heading_from_block(block)
-                        if heading_candidate:
-                            title = heading_candidate
-                        else:
-                            # Try to extract from content lines
-                            lines = [l.strip() for l in section["content"].split("\n") if l.strip()]
-                            # Prefer all-caps or title-cased, short lines (likely dish names, headings, etc.)
-                            for l in lines:
-                                if (l.isupper() or l.istitle()) and 1 <= len(l.split()) <= 8 and not l.lower().startswith("paragraph"):
-                                    title = l
-                                    break
-                            # Otherwise, look for lines that are bold or large font in the page blocks
-                            if (not title or title.lower().startswith("paragraph")):
-                                for b in blocks:
-                                    if self._is_bold_or_styled(b):
-                                        t = ''.join([span['text'] for line in b.get('lines', []) for span in line.get('spans', [])]).strip()
-                                        if t and 1 <= len(t.split()) <= 8 and not t.lower().startswith("paragraph"):
-                                            title = t
-                                            break
-                            # Otherwise, use first non-empty line
-                            if (not title or title.lower().startswith("paragraph")) and lines:
-                                title = lines[0][:40]
-                            # Fallback: use first sentence
-                            if not title or title.lower().startswith("paragraph"):
-                                first_sentence = section["content"].split(". ")[0][:40]
-                                if first_sentence:
-                                    title = first_sentence.strip()
-                    # Remove trailing colons, dashes, or numbering
-                    if title:
-                        import re
-                        title = re.sub(r'^[0-9]+[.\-\)]\s*', '', title)
-                        title = re.sub(r'[:\-\s]+$', '', title).strip()
-                    sections.append({
-                        "section_title": title,
-                        "page_number": page_num + 1,
-                        "content": section["content"],
-                        "confidence_score": section["confidence"]
-                    })
-        # Only fallback if <2 real sections found
-        meaningful_sections = [s for s in sections if s["section_title"] and not s["section_title"].lower().startswith("paragraph")]
-        if len(meaningful_sections) < 2:
-            # Try to extract better section titles from content before falling back
-            sections = self._improve_section_titles(sections, doc)
-            meaningful_sections = [s for s in sections if s["section_title"] and not s["section_title"].lower().startswith("paragraph")]
-            if len(meaningful_sections) < 2:
-                sections = self._fallback_paragraph_segmentation(doc)
-        # Limit to 10 most confident, diverse sections (one per doc if possible)
-        doc_seen = set()
-        filtered = []
-        for s in sorted(sections, key=lambda x: -x["confidence_score"]):
-            doc_id = s.get("document")
-            if doc_id not in doc_seen or len(filtered) < 5:
-                filtered.append(s)
-                if doc_id:
-                    doc_seen.add(doc_id)
-            if len(filtered) >= 10:
-                break
-        return filtered if filtered else sections
+            # Image blocks carry no text but hold their pixel data, so leave them out of the dict
+            with self.profiler.stage("parse.get_text"):
+                blocks = page.get_text("dict", flags=TEXT_FLAGS)["blocks"]
+            with self.profiler.stage("parse.heading_detection"):
+                features = self._page_block_features(blocks)
+                page_sections = self._split_page_sections(blocks, features)
+            for block, section in page_sections:
+                with self.profiler.stage("parse.section_titles"):
+                    title = self._resolve_section_title(block, section, features)
+                yield {
+                    "section_title": title,
+                    "page_number": page_num + 1,
+                    "content": section["content"],
+                    "confidence_score": section["confidence"]
+                }
+
+    def _is_meaningful_title(self, title):
+        return bool(title) and not title.lower().startswith("paragraph")
+
+    def _resolve_section_title(self, block, section, features):
+        # Try to extract a meaningful section title
+        title = section["title"]
+        # --- ADVANCED HEADING EXTRACTION LOGIC ---
+        if not title or title.lower().startswith("paragraph") or len(title.split()) < 2:
+            # Try to extract heading from block itself (font size, bold, all-caps, etc.)
+            heading_candidate = self._extract_heading_from_block(block)
+            if heading_candidate:
+                title = heading_candidate
+            else:
+                # Try to extract from content lines
+                lines = [l.strip() for l in section["content"].split("\n") if l.strip()]
+                # Prefer all-caps or title-cased, short lines (likely dish names, headings, etc.)
+                for l in lines:
+                    if (l.isupper() or l.istitle()) and 1 <= len(l.split()) <= 8 and not l.lower().startswith("paragraph"):
+                        title = l
+                        break
+                # Otherwise, look for lines that are bold or large font in the page blocks
+                if (not title or title.lower().startswith("paragraph")):
+                    for feature in features:
+                        if feature["bold"]:
+                            t = feature["text"].strip()
+                            if t and 1 <= len(t.split()) <= 8 and not t.lower().startswith("paragraph"):
+                                title = t
+                                break
+                # Otherwise, use first non-empty line
+                if (not title or title.lower().startswith("paragraph")) and lines:
+                    title = lines[0][:40]
+                # Fallback: use first sentence
+                if not title or title.lower().startswith("paragraph"):
+                    first_sentence = section["content"].split(". ")[0][:40]
+                    if first_sentence:
+                        title = first_sentence.strip()
+        # Remove trailing colons, dashes, or numbering
+        if title:
+            title = re.sub(r'^[0-9]+[.\-\)]\s*', '', title)
+            title = re.sub(r'[:\-\s]+$', '', title).strip()
+        return title
 
     def _improve_section_titles(self, sections, doc):
         """Try to extract better section titles from content"""
         improved_sections = []
         for section in sections:
-            if section["section_title"] and not section["section_title"].lower().startswith("paragraph"):
-                improved_sections.append(section)
-                continue
-            
-            # Try to extract a better title from the content
-            content = section["content"]
-            lines = [l.strip() for l in content.split("\n") if l.strip()]
-            
-            new_title = None
-            # Look for lines that could be headings (short, capitalized, etc.)
-            for line in lines[:5]:  # Check first 5 lines
-                words = line.split()
-                if 2 <= len(words) <= 10:  # Reasonable heading length
-                    # Check if it looks like a heading
-                    if (line.isupper() or line.istitle() or
-                        any(word.isupper() for word in words[:3]) or
-                        line.endswith(':') or
-                        all(word[0].isupper() for word in words if word)):
-                        new_title = line.rstrip(':').strip()
-                        break
-            
-            # If still no good title, use first sentence
-            if not new_title and lines:
-                first_sentence = content.split('.')[0].strip()
-                if 3 <= len(first_sentence.split()) <= 15:
-                    new_title = first_sentence
-                else:
-                    new_title = lines[0][:50] + "..." if len(lines[0]) > 50 else lines[0]
-            
-            section["section_title"] = new_title or section["section_title"]
+            section["section_title"] = self._improved_title(section)
             improved_sections.append(section)
-        
         return improved_sections
 
+    def _improved_title(self, section):
+        if self._is_meaningful_title(section["section_title"]):
+            return section["section_title"]
+        
+        # Try to extract a better title from the content
+        content = section["content"]
+        lines = [l.strip() for l in content.split("\n") if l.strip()]
+        
+        new_title = None
+        # Look for lines that could be headings (short, capitalized, etc.)
+        for line in lines[:5]:  # Check first 5 lines
+            words = line.split()
+            if 2 <= len(words) <= 10:  # Reasonable heading length
+                # Check if it looks like a heading
+                if (line.isupper() or line.istitle() or
+                    any(word.isupper() for word in words[:3]) or
+                    line.endswith(':') or
+                    all(word[0].isupper() for word in words if word)):
+                    new_title = line.rstrip(':').strip()
+                    break
+        
+        # If still no good title, use first sentence
+        if not new_title and lines:
+            first_sentence = content.split('.')[0].strip()
+            if 3 <= len(first_sentence.split()) <= 15:
+                new_title = first_sentence
+            else:
+                new_title = lines[0][:50] + "..." if len(lines[0]) > 50 else lines[0]
+        
+        return new_title or section["section_title"]
+
     def _extract_heading_from_block(self, block):
         # Try to extract a heading from the block using font size, bold, all-caps, etc.
         try:
@@ -140,26 +194,48 @@ class EnhancedPDFParser:
             pass
         return None
 
-    def _is_section_heading(self, block, context_blocks):
+    def _page_block_features(self, blocks):
+        # Compute every per-block heading signal once so a page is scored in linear time
+        avg_size = self._average_font_size(blocks)
+        features = []
+        for block in blocks:
+            spans = [span['text'] for line in block.get('lines', []) for span in line.get('spans', [])]
+            text = ''.join(spans)
+            try:
+                size = block['lines'][0]['spans'][0]['size']
+            except Exception:
+                size = None
+            feature = {
+                "spans": spans,
+                "text": text,
+                "size": size,
+                "bold": self._is_bold_or_styled(block),
+                "word_count": len(text.split())
+            }
+            feature["heading_score"] = self._heading_score(block, feature, avg_size)
+            feature["is_heading"] = feature["heading_score"] > 0.6
+            features.append(feature)
+        return features
+
+    def _average_font_size(self, blocks):
+        # None mirrors a page whose sizes can't be read: no block gets the font size signal
+        try:
+            sizes = [b['lines'][0]['spans'][0]['size'] for b in blocks if b.get('lines')]
+        except Exception:
+            return None
+        return sum(sizes) / len(sizes) if sizes else 0
+
+    def _heading_score(self, block, feature, avg_size):
         score = 0
-        if self._has_font_size_jump(block, context_blocks):
+        if feature["size"] is not None and avg_size is not None and feature["size"] - avg_size > self.heading_indicators['font_size_jump']:
             score += 0.3
         if self._is_isolated_block(block):
             score += 0.2
-        if self._is_bold_or_styled(block):
+        if feature["bold"]:
             score += 0.2
-        if self._is_heading_length(block):
+        if 2 <= feature["word_count"] <= 12:
             score += 0.3
-        return score > 0.6
-
-    def _has_font_size_jump(self, block, context_blocks):
-        try:
-            block_size = block['lines'][0]['spans'][0]['size']
-            sizes = [b['lines'][0]['spans'][0]['size'] for b in context_blocks if b.get('lines')]
-            avg_size = sum(sizes) / len(sizes) if sizes else 0
-            return block_size - avg_size > self.heading_indicators['font_size_jump']
-        except Exception:
-            return False
+        return score
 
     def _is_isolated_block(self, block):
         # Heuristic: block with few lines and much whitespace
@@ -180,38 +256,32 @@ class EnhancedPDFParser:
             pass
         return False
 
-    def _is_heading_length(self, block):
-        try:
-            text = ''.join([span['text'] for line in block.get('lines', []) for span in line.get('spans', [])])
-            return 2 <= len(text.split()) <= 12
-        except Exception:
-            return False
-
-    def _extract_section_content(self, page, heading_block, blocks):
-        # Simple: get text from heading to next heading or end of page
+    def _split_page_sections(self, blocks, features):
+        # Single sweep: each heading owns the text of the blocks up to the next heading
+        sections = []
+        heading_index = None
         lines = []
-        found_heading = False
-        heading_text = ''
-        for line in heading_block.get('lines', []):
-            for span in line.get('spans', []):
-                heading_text += span['text'] + ' '
-        heading_text = heading_text.strip()
-        for block in blocks:
-            if found_heading:
-                if self._is_section_heading(block, blocks):
-                    break
-                for line in block.get('lines', []):
-                    for span in line.get('spans', []):
-                        lines.append(span['text'])
-            elif block == heading_block:
-                found_heading = True
+        for i, feature in enumerate(features):
+            if feature["is_heading"]:
+                if heading_index is not None:
+                    sections.append(self._make_section(blocks, features, heading_index, lines))
+                heading_index = i
+                lines = []
+            elif heading_index is not None:
+                lines.extend(feature["spans"])
+        if heading_index is not None:
+            sections.append(self._make_section(blocks, features, heading_index, lines))
+        return sections
+
+    def _make_section(self, blocks, features, heading_index, lines):
+        heading_text = ' '.join(features[heading_index]["spans"]).strip()
         content = ' '.join(lines).strip()
         confidence = 0.9 if heading_text else 0.5
-        return {"title": heading_text, "content": content, "confidence": confidence}
+        return blocks[heading_index], {"title": heading_text, "content": content, "confidence": confidence}
 
     def _fallback_paragraph_segmentation(self, doc):
-        # Fallback: split by paragraphs or fixed chunking
-        sections = []
+        # Fallback: split by paragraphs or fixed chunking, yielding as pages are read
+        found_paragraphs = False
         for page_num, page in enumerate(doc):
             text = page.get_text()
             paragraphs = [p.strip() for p in text.split('\n\n') if len(p.strip()) > 30]
@@ -241,23 +311,23 @@ class EnhancedPDFParser:
                         elif lines[0]:
                             title = lines[0][:60] + "..." if len(lines[0]) > 60 else lines[0]
                 
-                sections.append({
+                found_paragraphs = True
+                yield {
                     "section_title": title,
                     "page_number": page_num + 1,
                     "content": para,
                     "confidence_score": 0.4
-                })
-        if not sections:
+                }
+        if not found_paragraphs:
             # Last resort: fixed chunking
             for page_num, page in enumerate(doc):
                 text = page.get_text()
                 chunk_size = 500
                 for i in range(0, len(text), chunk_size):
                     chunk = text[i:i+chunk_size]
-                    sections.append({
+                    yield {
                         "section_title": f"Chunk {i//chunk_size+1}",
                         "page_number": page_num + 1,
                         "content": chunk,
                         "confidence_score": 0.2
-                    })
-        return sections
+                    }
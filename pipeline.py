@@ -0,0 +1,71 @@
+import queue
+import threading
+import numpy as np
+from vector_index import section_key
+
+_END = object()
+
+class EmbeddingStage:
+    """Embeds section contents on a background thread while parsing continues.
+
+    Parsed sections go through a bounded queue, so a parser that gets ahead of the
+    model blocks instead of buffering the whole corpus. The thread encodes a
+    micro-batch once ``micro_batch`` texts have queued up, or sooner if the queue
+    runs dry, so the model is never left idle waiting for a full batch.
+
+    With a ``section_index``, sections already in the index (or already queued)
+    are skipped and ``keys`` lists the section keys of the embeddings returned.
+    """
+
+    def __init__(self, analyzer, micro_batch=64, max_queue=1024, section_index=None):
+        self.analyzer = analyzer
+        self.section_index = section_index
+        self.keys = []
+        self.queued_keys = set()
+        self.micro_batch = micro_batch
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.embeddings = []
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def put(self, sections):
+        for section in sections:
+            if self.section_index is not None:
+                key = section_key(section['content'])
+                if key in self.section_index or key in self.queued_keys:
+                    continue
+                self.queued_keys.add(key)
+                self.keys.append(key)
+            self.queue.put(section['content'])
+
+    def finish(self):
+        """Wait for the queue to drain and return embeddings in the order sections were put."""
+        self.queue.put(_END)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        if not self.embeddings:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(self.embeddings)
+
+    def _run(self):
+        finished = False
+        while not finished:
+            batch = []
+            item = self.queue.get()
+            while item is not _END:
+                batch.append(item)
+                if len(batch) >= self.micro_batch:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            finished = item is _END
+            if batch and self.error is None:
+                try:
+                    self.embeddings.append(self.analyzer._encode_sections(batch))
+                except Exception as e:
+                    # Keep draining so the producer never blocks on a full queue
+                    self.error = e
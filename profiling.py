@@ -0,0 +1,108 @@
+import contextlib
+import resource
+import threading
+import time
+
+class Profiler:
+    """Collects per-stage and per-document wall/CPU time plus encoder statistics.
+
+    CPU time is measured per thread, so stages running concurrently (parsing and
+    the background embedding stage) are not charged for each other's work.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+        self.stages = {}
+        self.documents = {}
+        self.encode_batches = []
+        self.token_count = 0
+        self.section_count = 0
+
+    @contextlib.contextmanager
+    def stage(self, name, document=None):
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall_start, time.thread_time() - cpu_start, document)
+
+    def add(self, name, wall, cpu, document=None, calls=1):
+        with self.lock:
+            self._accumulate(self.stages, name, wall, cpu, calls)
+            if document is not None:
+                self._accumulate(self.documents.setdefault(document, {}), name, wall, cpu, calls)
+
+    def _accumulate(self, stages, name, wall, cpu, calls):
+        totals = stages.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0})
+        totals["calls"] += calls
+        totals["wall"] += wall
+        totals["cpu"] += cpu
+
+    def record_encode(self, batch_size, tokens=0):
+        with self.lock:
+            self.encode_batches.append(batch_size)
+            self.token_count += tokens
+
+    def record_section_encode(self, count):
+        # Section texts among all encoded texts, which also include key sentences and task contexts
+        with self.lock:
+            self.section_count += count
+
+    def merge(self, report, document=None):
+        """Fold in the report of a profiler that ran elsewhere, e.g. in a parser worker process."""
+        for name, totals in report["stages"].items():
+            self.add(name, totals["wall"], totals["cpu"], document, totals["calls"])
+
+    def report(self):
+        with self.lock:
+            batches = self.encode_batches
+            return {
+                "wall_time": round(time.perf_counter() - self.start_time, 6),
+                "stages": self._rounded(self.stages),
+                "documents": {document: self._rounded(stages) for document, stages in self.documents.items()},
+                "encode": {
+                    "batches": len(batches),
+                    "texts": sum(batches),
+                    "tokens": self.token_count,
+                    "section_texts": self.section_count,
+                    "batch_size_min": min(batches) if batches else 0,
+                    "batch_size_max": max(batches) if batches else 0,
+                    "batch_size_mean": round(sum(batches) / len(batches), 2) if batches else 0
+                },
+                # ru_maxrss is in kilobytes on Linux; children covers parser worker processes
+                "peak_rss_mb": {
+                    "main": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                    "workers": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+                }
+            }
+
+    def _rounded(self, stages):
+        return {name: {"calls": totals["calls"], "wall": round(totals["wall"], 6), "cpu": round(totals["cpu"], 6)}
+                for name, totals in sorted(stages.items())}
+
+class NullProfiler:
+    """Stand-in used when profiling is off; every hook is a no-op."""
+
+    enabled = False
+    _null_stage = contextlib.nullcontext()
+
+    def stage(self, name, document=None):
+        return self._null_stage
+
+    def add(self, name, wall, cpu, document=None, calls=1):
+        pass
+
+    def record_encode(self, batch_size, tokens=0):
+        pass
+
+    def record_section_encode(self, count):
+        pass
+
+    def merge(self, report, document=None):
+        pass
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from analysis_engine import PersonaDrivenAnalyzer, MODEL_NAME
+from embedding_backend import BACKENDS, model_key
+from embedding_cache import EmbeddingCache
+from main import prepare_job, process_pipeline, open_parse_cache, positive_int
+from output_generator import build_output
+
+class BatchingEncoder:
+    """Wraps a model so encode() calls from concurrent requests share one forward pass.
+
+    Calls arriving within ``max_wait`` seconds of each other are concatenated, encoded
+    together and split back per caller.
+    """
+
+    def __init__(self, model, max_batch_texts=512, max_wait=0.005):
+        self.model = model
+        self.max_batch_texts = max_batch_texts
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        if kwargs:
+            return self.model.encode(texts, batch_size=batch_size, **kwargs)
+        request = {"texts": list(texts), "batch_size": batch_size, "done": threading.Event()}
+        self.requests.put(request)
+        request["done"].wait()
+        if "error" in request:
+            raise request["error"]
+        return request["result"]
+
+    def _run(self):
+        while True:
+            pending = [self.requests.get()]
+            total = len(pending[0]["texts"])
+            # Give other request threads a short window to join this batch
+            while total < self.max_batch_texts:
+                try:
+                    request = self.requests.get(timeout=self.max_wait)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                total += len(request["texts"])
+            self._encode_batch(pending)
+
+    def _encode_batch(self, pending):
+        texts = [text for request in pending for text in request["texts"]]
+        try:
+            embeddings = self.model.encode(texts, batch_size=max(request["batch_size"] for request in pending))
+            self.batches += 1
+        except Exception as e:
+            for request in pending:
+                request["error"] = e
+                request["done"].set()
+            return
+        offset = 0
+        for request in pending:
+            count = len(request["texts"])
+            request["result"] = np.asarray(embeddings[offset:offset + count])
+            offset += count
+            request["done"].set()
+
+class AnalysisServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, analyzer, workers=1, use_parse_cache=True, base_dir='.'):
+        super().__init__(address, AnalysisRequestHandler)
+        self.analyzer = analyzer
+        self.workers = workers
+        self.use_parse_cache = use_parse_cache
+        self.base_dir = os.path.realpath(base_dir)
+
+    def confine(self, path):
+        """Resolve a client-supplied path against base_dir, refusing anything that ends up outside it."""
+        resolved = os.path.realpath(os.path.join(self.base_dir, path))
+        if os.path.commonpath([resolved, self.base_dir]) != self.base_dir:
+            raise PermissionError(f"Path is outside the server's base directory: {path}")
+        return resolved
+
+    def analyze(self, input_config, input_json_path):
+        task_context, documents, metadata = prepare_job(input_config)
+        # PDFs are resolved next to the input JSON the same way resolve_documents does
+        input_dir = os.path.dirname(input_json_path)
+        for doc in documents:
+            pdf_path = doc.get("path") or (os.path.join('PDFs', doc["filename"]) if doc.get("filename") else None)
+            if pdf_path:
+                self.confine(os.path.join(input_dir, pdf_path))
+        parse_cache = open_parse_cache(input_json_path) if self.use_parse_cache else None
+        results = process_pipeline(task_context, documents, input_json_path, metadata,
+                                   workers=self.workers, parse_cache=parse_cache, analyzer=self.analyzer)
+        return build_output(*results)
+
+def check_job(input_config):
+    """Raise ValueError for valid JSON of the wrong shape; missing fields are left to prepare_job."""
+    if not isinstance(input_config, dict):
+        raise ValueError("input JSON must be an object")
+    for field in ("persona", "job_to_be_done"):
+        if field in input_config and not isinstance(input_config[field], dict):
+            raise ValueError(f"'{field}' must be an object")
+    documents = input_config.get("documents", [])
+    if not isinstance(documents, list) or not all(isinstance(doc, dict) for doc in documents):
+        raise ValueError("'documents' must be a list of objects")
+    for doc in documents:
+        for field in ("path", "filename"):
+            if doc.get(field) is not None and not isinstance(doc[field], str):
+                raise ValueError(f"document '{field}' must be a string")
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if urlparse(self.path).path == '/health':
+            self._send_json(200, {"status": "ok", "model": model_key(MODEL_NAME, self.server.analyzer.backend)})
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/analyze':
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        params = parse_qs(url.query)
+        try:
+            input_config, input_json_path = self._read_job(params)
+        except PermissionError as e:
+            self._send_json(403, {"error": str(e)})
+            return
+        except FileNotFoundError as e:
+            self._send_json(404, {"error": f"Input file not found: {e.filename}"})
+            return
+        except json.JSONDecodeError as e:
+            self._send_json(400, {"error": f"Malformed JSON in request: {e}"})
+            return
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid request: {e}"})
+            return
+        try:
+            output_data = self.server.analyze(input_config, input_json_path)
+        except PermissionError as e:
+            self._send_json(403, {"error": str(e)})
+            return
+        except KeyError as e:
+            self._send_json(400, {"error": f"Missing field in input JSON: {e}"})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"Analysis failed: {e}"})
+            return
+        self._send_json(200, output_data)
+
+    def _read_job(self, params):
+        # Either ?input_path=<file on the server> or an input JSON body whose PDFs resolve against ?base_dir=,
+        # both relative to (and confined to) the server's --base-dir
+        if 'input_path' in params:
+            input_json_path = self.server.confine(params['input_path'][0])
+            with open(input_json_path, 'r', encoding='utf-8') as f:
+                input_config = json.load(f)
+        else:
+            length = int(self.headers.get('Content-Length', 0))
+            input_config = json.loads(self.rfile.read(length).decode('utf-8'))
+            base_dir = self.server.confine(params.get('base_dir', ['.'])[0])
+            input_json_path = os.path.join(base_dir, 'challenge1b_input.json')
+        check_job(input_config)
+        return input_config, input_json_path
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, indent=2, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve persona-driven PDF analysis over HTTP with a warm model.")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to bind')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--base-dir', type=str, default='.', help='Directory requests are confined to; input_path and base_dir are resolved against it')
+    parser.add_argument('--batch-size', type=int, default=64, help='Number of sections encoded per model batch')
+    parser.add_argument('--max-batch-texts', type=int, default=512, help='Upper bound on texts merged from concurrent requests into one encode call')
+    parser.add_argument('--batch-wait-ms', type=float, default=5.0, help='How long to wait for concurrent requests to join an encode batch')
+    parser.add_argument('--embedding-cache', type=str, default=None, help='Directory for the persistent embedding cache (disabled if omitted)')
+    parser.add_argument('--embedding-cache-size', type=positive_int, default=200000, help='Maximum number of embeddings kept in the cache')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes used to parse PDFs (0 uses every core)')
+    parser.add_argument('--no-parse-cache', action='store_true', help='Parse every PDF from scratch without reading or writing the parse cache')
+    parser.add_argument('--backend', type=str, choices=BACKENDS, default='torch', help='Embedding inference backend: full-precision PyTorch, int8-quantized PyTorch, or ONNX Runtime (fp32 or int8)')
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op threads used by the embedding backend (library default if omitted)')
+    parser.add_argument('--interop-threads', type=int, default=None, help='Inter-op threads used by the embedding backend (library default if omitted)')
+    args = parser.parse_args()
+
+    embedding_cache = None
+    if args.embedding_cache:
+        embedding_cache = EmbeddingCache(args.embedding_cache, model_key(MODEL_NAME, args.backend), max_entries=args.embedding_cache_size)
+    analyzer = PersonaDrivenAnalyzer(batch_size=args.batch_size, embedding_cache=embedding_cache,
+                                     backend=args.backend, threads=args.threads, interop_threads=args.interop_threads)
+    analyzer.model = BatchingEncoder(analyzer.model, max_batch_texts=args.max_batch_texts, max_wait=args.batch_wait_ms / 1000)
+    server = AnalysisServer((args.host, args.port), analyzer, workers=args.workers,
+                            use_parse_cache=not args.no_parse_cache, base_dir=args.base_dir)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} (POST /analyze, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
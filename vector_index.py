@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import re
+import numpy as np
+
+def section_key(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class SectionIndex:
+    """Persistent IVF (inverted file) index over normalized section embeddings.
+
+    Vectors are clustered with spherical k-means; a query scores the centroids and
+    only scans the lists of the ``n_probe`` closest ones. New vectors are appended
+    to their nearest list, and the clustering is retrained whenever the index has
+    grown ``retrain_growth`` times since it was last trained.
+    """
+
+    def __init__(self, index_dir, model_name, n_probe=8, min_train_size=1024, retrain_growth=2.0):
+        # One subdirectory per model and backend, so switching backends keeps both indexes
+        self.index_dir = os.path.join(index_dir, re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name))
+        self.model_name = model_name
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.keys = []
+        self.positions = {}
+        self.vectors = None
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_size = 0
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        meta_path = os.path.join(self.index_dir, 'meta.json')
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if meta.get("model") != self.model_name:
+            return
+        keys = meta["keys"]
+        try:
+            vectors = np.load(os.path.join(self.index_dir, 'vectors.npy'))
+            assignments = np.load(os.path.join(self.index_dir, 'assignments.npy'))
+            centroids = np.load(os.path.join(self.index_dir, 'centroids.npy')) if meta["trained"] else None
+        except (OSError, ValueError):
+            return
+        # Files from an interrupted save that don't line up with meta.json: start empty
+        if len(vectors) != len(keys) or len(assignments) != len(keys):
+            return
+        if centroids is not None and len(assignments) and assignments.max() >= len(centroids):
+            return
+        self.keys = keys
+        self.positions = {key: i for i, key in enumerate(keys)}
+        self.trained_size = meta["trained_size"]
+        self.vectors = vectors
+        self.assignments = assignments
+        self.centroids = centroids
+        self._rebuild_lists()
+
+    def save(self):
+        if not self.dirty or self.vectors is None:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._save_array('vectors.npy', self.vectors)
+        self._save_array('assignments.npy', self.assignments)
+        if self.centroids is not None:
+            self._save_array('centroids.npy', self.centroids)
+        meta = {
+            "model": self.model_name,
+            "keys": self.keys,
+            "trained": self.centroids is not None,
+            "trained_size": self.trained_size
+        }
+        tmp_path = os.path.join(self.index_dir, 'meta.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.index_dir, 'meta.json'))
+        self.dirty = False
+
+    def _save_array(self, name, array):
+        # meta.json is written last, so a crash leaves the previous arrays or a detectable mismatch
+        path = os.path.join(self.index_dir, name)
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, array)
+        os.replace(path + '.tmp', path)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def get(self, keys):
+        return self.vectors[[self.positions[key] for key in keys]]
+
+    def add(self, keys, vectors):
+        new = {}
+        for key, vector in zip(keys, _normalize(vectors)):
+            if key not in self.positions and key not in new:
+                new[key] = vector
+        if not new:
+            return
+        start = len(self.keys)
+        new_vectors = np.stack(list(new.values()))
+        self.vectors = new_vectors if self.vectors is None else np.vstack([self.vectors, new_vectors])
+        for i, key in enumerate(new, start):
+            self.keys.append(key)
+            self.positions[key] = i
+        if self.centroids is not None:
+            self.assignments = np.concatenate([self.assignments, self._assign(new_vectors)])
+        else:
+            self.assignments = np.concatenate([self.assignments, np.zeros(len(new), dtype=np.int32)])
+        self.dirty = True
+        if self._needs_training():
+            self.train()
+        else:
+            self._rebuild_lists()
+
+    def _needs_training(self):
+        if len(self.keys) < self.min_train_size:
+            return False
+        return self.centroids is None or len(self.keys) >= self.trained_size * self.retrain_growth
+
+    def train(self, iterations=10, seed=0):
+        n = len(self.keys)
+        n_lists = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(n, n_lists, replace=False)]
+        for _ in range(iterations):
+            assignments = self._assign(self.vectors, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, self.vectors)
+            empty = np.bincount(assignments, minlength=n_lists) == 0
+            # Reseed empty lists so every centroid keeps a share of the corpus
+            sums[empty] = self.vectors[rng.choice(n, int(empty.sum()), replace=False)]
+            centroids = _normalize(sums)
+        self.centroids = centroids
+        self.assignments = self._assign(self.vectors)
+        self.trained_size = n
+        self.dirty = True
+        self._rebuild_lists()
+
+    def _assign(self, vectors, centroids=None, chunk_size=4096):
+        centroids = self.centroids if centroids is None else centroids
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            assignments[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+        return assignments
+
+    def _rebuild_lists(self):
+        # Rows grouped by list, with offsets, so a probe is one contiguous slice
+        self.list_order = np.argsort(self.assignments, kind='stable')
+        n_lists = len(self.centroids) if self.centroids is not None else 1
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(self.assignments, minlength=n_lists))])
+
+    def search(self, query, top_n, allowed_keys=None):
+        """Return up to top_n (key, cosine score) pairs, best first, optionally restricted to allowed_keys."""
+        if self.vectors is None:
+            return []
+        query = _normalize(query)
+        allowed = None
+        if allowed_keys is not None:
+            allowed = np.zeros(len(self.keys), dtype=bool)
+            allowed[[self.positions[key] for key in allowed_keys if key in self.positions]] = True
+        if self.centroids is None:
+            rows = np.arange(len(self.keys)) if allowed is None else np.flatnonzero(allowed)
+        else:
+            rows = self._probe(query, top_n, allowed)
+        scores = self.vectors[rows] @ query
+        if len(rows) > top_n:
+            best = np.argpartition(-scores, top_n - 1)[:top_n]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind='stable')
+        return [(self.keys[rows[i]], float(scores[i])) for i in order]
+
+    def _probe(self, query, top_n, allowed):
+        # Visit lists nearest-first; keep probing past n_probe until top_n allowed rows are found
+        list_order = np.argsort(-(self.centroids @ query))
+        chunks = []
+        found = 0
+        for probed, list_id in enumerate(list_order):
+            if probed >= self.n_probe and found >= top_n:
+                break
+            rows = self.list_order[self.list_offsets[list_id]:self.list_offsets[list_id + 1]]
+            if allowed is not None:
+                rows = rows[allowed[rows]]
+            chunks.append(rows)
+            found += len(rows)
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)